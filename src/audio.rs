@@ -1,28 +1,86 @@
 //! Audio decoding utilities.
 //!
 //! `decode_to_pcm` shells out to `ffmpeg` to decode arbitrary audio/video
-//! files into mono 16kHz f32 PCM.  `decode_raw_f32le` is a zero-copy fast
+//! files into mono 16kHz f32 PCM; WAV files that are already 16kHz mono PCM
+//! are parsed in-process instead.  `decode_file_to_pcm` does the same for
+//! audio that is already on disk, without copying it.  `decode_raw_f32le` is a zero-copy fast
 //! path for clients that already produce 16kHz mono f32le PCM directly.
+//! `read_f32le` does the same conversion incrementally from a stream.
 
 use anyhow::{Context, Result};
-use std::io::Write;
+use std::fs::File;
+use std::io::{ErrorKind, Read, Write};
+use std::path::Path;
 use std::process::{Command, Stdio};
 use tempfile::NamedTempFile;
 use tracing::debug;
 
+/// Size of the scratch buffer used when converting streamed PCM bytes.
+const READ_CHUNK_BYTES: usize = 64 * 1024;
+
+/// WAV `fmt ` format tags accepted by the in-process fast path.
+const WAVE_FORMAT_PCM: u16 = 1;
+const WAVE_FORMAT_IEEE_FLOAT: u16 = 3;
+
+/// How much of a file `decode_file_to_pcm` reads to find the WAV `data`
+/// chunk. Generous, since metadata chunks may precede it.
+const WAV_HEADER_PROBE_BYTES: usize = 64 * 1024;
+
+/// Scale from s16 to [-1.0, 1.0). A power of two, so the multiply is exact.
+const I16_SCALE: f32 = 1.0 / 32768.0;
+
 /// Decode any audio/video file into mono f32 PCM at 16kHz.
 ///
 /// Writes input to a tempfile and passes the path to `ffmpeg`, which handles
 /// all demuxing, decoding, resampling, and channel mixdown in a single pass.
+/// WAV input that is already 16kHz mono s16le/f32le skips ffmpeg entirely.
 pub fn decode_to_pcm(data: &[u8]) -> Result<Vec<f32>> {
+    if let Some(samples) = decode_wav_16k_mono(data).filter(|s| !s.is_empty()) {
+        debug!(
+            "Decoded 16kHz mono WAV in-process ({:.1}s)",
+            samples.len() as f64 / 16_000.0
+        );
+        return Ok(samples);
+    }
+
     let mut tmp = NamedTempFile::new().context("Failed to create tempfile")?;
     tmp.write_all(data)
         .context("Failed to write audio data to tempfile")?;
 
-    let output = Command::new("ffmpeg")
+    ffmpeg_decode(tmp.path())
+}
+
+/// Decode an audio/video file on disk into mono f32 PCM at 16kHz.
+///
+/// Like `decode_to_pcm`, but ffmpeg reads the file in place, so large
+/// downloads are never copied into memory or into a second tempfile.
+pub fn decode_file_to_pcm(path: &Path) -> Result<Vec<f32>> {
+    // Decide from the header alone; only a WAV that qualifies for the
+    // in-process path is read in full.
+    let mut header = Vec::with_capacity(WAV_HEADER_PROBE_BYTES);
+    File::open(path)
+        .and_then(|f| f.take(WAV_HEADER_PROBE_BYTES as u64).read_to_end(&mut header))
+        .context("Failed to read audio file")?;
+    if wav_16k_mono_layout(&header).is_some() {
+        let data = std::fs::read(path).context("Failed to read audio file")?;
+        if let Some(samples) = decode_wav_16k_mono(&data).filter(|s| !s.is_empty()) {
+            debug!(
+                "Decoded 16kHz mono WAV in-process ({:.1}s)",
+                samples.len() as f64 / 16_000.0
+            );
+            return Ok(samples);
+        }
+    }
+
+    ffmpeg_decode(path)
+}
+
+/// Run ffmpeg on `path`, converting whatever it contains to mono 16kHz f32.
+fn ffmpeg_decode(path: &Path) -> Result<Vec<f32>> {
+    let mut child = Command::new("ffmpeg")
         .args([
             "-i",
-            tmp.path().to_str().unwrap(),
+            path.to_str().context("Audio file path is not valid UTF-8")?,
             "-f", "f32le",        // output raw 32-bit float little-endian
             "-acodec", "pcm_f32le",
             "-ar", "16000",       // resample to 16kHz
@@ -33,35 +91,123 @@ pub fn decode_to_pcm(data: &[u8]) -> Result<Vec<f32>> {
         .stdout(Stdio::piped())
         .stderr(Stdio::piped())
         .spawn()
-        .context("Failed to spawn ffmpeg — is it installed?")?
-        .wait_with_output()
-        .context("Failed to wait for ffmpeg")?;
+        .context("Failed to spawn ffmpeg — is it installed?")?;
+
+    // Convert samples as they arrive instead of collecting all of stdout
+    // first, so peak memory is one f32 buffer rather than bytes + floats.
+    // stderr is drained on a side thread so ffmpeg can never block on it.
+    let stdout = child.stdout.take().context("ffmpeg stdout was not piped")?;
+    let mut stderr = child.stderr.take().context("ffmpeg stderr was not piped")?;
+    let (samples, stderr) = std::thread::scope(|scope| {
+        let stderr_handle = scope.spawn(move || {
+            let mut buf = Vec::new();
+            let _ = stderr.read_to_end(&mut buf);
+            buf
+        });
+        let samples = read_f32le(stdout);
+        (samples, stderr_handle.join().unwrap_or_default())
+    });
 
-    if !output.status.success() {
-        let stderr = String::from_utf8_lossy(&output.stderr);
+    let status = child.wait().context("Failed to wait for ffmpeg")?;
+    if !status.success() {
+        let stderr = String::from_utf8_lossy(&stderr);
         anyhow::bail!("ffmpeg failed: {stderr}");
     }
 
-    let raw = &output.stdout;
-    if raw.is_empty() {
+    let samples = samples.context("Failed to read ffmpeg output")?;
+    if samples.is_empty() {
         anyhow::bail!("ffmpeg produced no audio output — file may contain no audio track");
     }
 
     debug!(
-        "ffmpeg decoded {} bytes of f32le PCM ({:.1}s at 16kHz)",
-        raw.len(),
-        raw.len() as f64 / (16_000.0 * 4.0)
+        "ffmpeg decoded {} samples of f32le PCM ({:.1}s at 16kHz)",
+        samples.len(),
+        samples.len() as f64 / 16_000.0
     );
 
-    // Reinterpret the raw bytes as f32 samples (little-endian)
-    let samples: Vec<f32> = raw
-        .chunks_exact(4)
-        .map(|chunk| f32::from_le_bytes([chunk[0], chunk[1], chunk[2], chunk[3]]))
-        .collect();
-
     Ok(samples)
 }
 
+/// Decode a WAV file that is already mono 16kHz PCM (s16le or f32le)
+/// without ffmpeg. Returns `None` for any other layout or a malformed
+/// header, so the caller can fall back to ffmpeg.
+fn decode_wav_16k_mono(data: &[u8]) -> Option<Vec<f32>> {
+    let layout = wav_16k_mono_layout(data)?;
+    // Streamed WAVs may carry a bogus (e.g. 0xFFFFFFFF) size; clamp it.
+    let end = layout.data_start.saturating_add(layout.data_len).min(data.len());
+    let body = &data[layout.data_start..end];
+
+    Some(match layout.tag {
+        WAVE_FORMAT_PCM => body
+            .chunks_exact(2)
+            .map(|b| f32::from(i16::from_le_bytes([b[0], b[1]])) * I16_SCALE)
+            .collect(),
+        _ => body
+            .chunks_exact(4)
+            .map(|b| f32::from_le_bytes([b[0], b[1], b[2], b[3]]))
+            .collect(),
+    })
+}
+
+/// Sample layout of a WAV file that qualifies for `decode_wav_16k_mono`.
+struct WavLayout {
+    /// `WAVE_FORMAT_PCM` (s16) or `WAVE_FORMAT_IEEE_FLOAT` (f32).
+    tag: u16,
+    /// Offset of the `data` chunk body.
+    data_start: usize,
+    /// Declared `data` chunk size (may exceed the file for streamed WAVs).
+    data_len: usize,
+}
+
+/// Parse the RIFF header and return where the samples live if the file is
+/// mono 16kHz s16le/f32le. Only the bytes up to the `data` chunk header
+/// are needed, so a prefix of a file is enough to decide.
+fn wav_16k_mono_layout(data: &[u8]) -> Option<WavLayout> {
+    if data.len() < 12 || &data[0..4] != b"RIFF" || &data[8..12] != b"WAVE" {
+        return None;
+    }
+
+    // (format tag, bits per sample) from the `fmt ` chunk.
+    let mut format: Option<(u16, u16)> = None;
+    let mut pos = 12;
+    while pos + 8 <= data.len() {
+        let id = &data[pos..pos + 4];
+        let size = u32::from_le_bytes([data[pos + 4], data[pos + 5], data[pos + 6], data[pos + 7]])
+            as usize;
+        let body_start = pos + 8;
+
+        match id {
+            b"fmt " => {
+                let body = &data[body_start..body_start.saturating_add(size).min(data.len())];
+                if body.len() < 16 {
+                    return None;
+                }
+                let tag = u16::from_le_bytes([body[0], body[1]]);
+                let channels = u16::from_le_bytes([body[2], body[3]]);
+                let rate = u32::from_le_bytes([body[4], body[5], body[6], body[7]]);
+                let bits = u16::from_le_bytes([body[14], body[15]]);
+                if channels != 1 || rate != 16_000 {
+                    return None;
+                }
+                format = Some((tag, bits));
+            }
+            b"data" => {
+                return match format? {
+                    (tag @ WAVE_FORMAT_PCM, 16) | (tag @ WAVE_FORMAT_IEEE_FLOAT, 32) => {
+                        Some(WavLayout { tag, data_start: body_start, data_len: size })
+                    }
+                    _ => None,
+                };
+            }
+            _ => {}
+        }
+
+        // Chunks are word-aligned: an odd size is followed by a pad byte.
+        pos = body_start.saturating_add(size).saturating_add(size & 1);
+    }
+    None
+}
+
 /// Interpret raw f32le bytes as mono 16kHz PCM.
 ///
 /// Used for audio sent directly by the telemuze client, which already produces
@@ -77,3 +223,125 @@ pub fn decode_raw_f32le(data: &[u8]) -> Result<Vec<f32>> {
         .map(|b| f32::from_le_bytes([b[0], b[1], b[2], b[3]]))
         .collect())
 }
+
+/// Read raw f32le mono PCM from `reader` until EOF.
+///
+/// Converts through a fixed-size byte buffer, so the only full-size
+/// allocation is the returned sample vector — there is no intermediate
+/// byte copy of the whole stream.
+pub fn read_f32le<R: Read>(mut reader: R) -> Result<Vec<f32>> {
+    let mut samples = Vec::new();
+    let mut buf = vec![0u8; READ_CHUNK_BYTES];
+    let mut filled = 0;
+    loop {
+        let n = match reader.read(&mut buf[filled..]) {
+            Ok(0) => break,
+            Ok(n) => n,
+            Err(e) if e.kind() == ErrorKind::Interrupted => continue,
+            Err(e) => return Err(e).context("Failed to read PCM stream"),
+        };
+        filled += n;
+        let whole = filled - filled % 4;
+        samples.extend(
+            buf[..whole]
+                .chunks_exact(4)
+                .map(|b| f32::from_le_bytes([b[0], b[1], b[2], b[3]])),
+        );
+        buf.copy_within(whole..filled, 0);
+        filled -= whole;
+    }
+    anyhow::ensure!(
+        filled == 0,
+        "PCM byte length {} is not a multiple of 4",
+        samples.len() * 4 + filled
+    );
+    Ok(samples)
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    /// Build a WAV file with the given format fields, optional extra chunk
+    /// before `data`, and sample payload.
+    fn wav(tag: u16, channels: u16, rate: u32, bits: u16, extra: &[u8], payload: &[u8]) -> Vec<u8> {
+        let mut fmt = Vec::new();
+        fmt.extend_from_slice(&tag.to_le_bytes());
+        fmt.extend_from_slice(&channels.to_le_bytes());
+        fmt.extend_from_slice(&rate.to_le_bytes());
+        let block_align = channels * bits / 8;
+        fmt.extend_from_slice(&(rate * block_align as u32).to_le_bytes());
+        fmt.extend_from_slice(&block_align.to_le_bytes());
+        fmt.extend_from_slice(&bits.to_le_bytes());
+
+        let mut body = b"WAVE".to_vec();
+        body.extend_from_slice(b"fmt ");
+        body.extend_from_slice(&(fmt.len() as u32).to_le_bytes());
+        body.extend_from_slice(&fmt);
+        body.extend_from_slice(extra);
+        body.extend_from_slice(b"data");
+        body.extend_from_slice(&(payload.len() as u32).to_le_bytes());
+        body.extend_from_slice(payload);
+
+        let mut out = b"RIFF".to_vec();
+        out.extend_from_slice(&(body.len() as u32).to_le_bytes());
+        out.extend_from_slice(&body);
+        out
+    }
+
+    #[test]
+    fn wav_s16_mono_16k() {
+        let payload: Vec<u8> = [0i16, 16384, -32768]
+            .iter()
+            .flat_map(|s| s.to_le_bytes())
+            .collect();
+        let samples = decode_wav_16k_mono(&wav(1, 1, 16_000, 16, &[], &payload)).unwrap();
+        assert_eq!(samples, vec![0.0, 0.5, -1.0]);
+    }
+
+    #[test]
+    fn wav_f32_mono_16k() {
+        let payload: Vec<u8> = [0.25f32, -0.75].iter().flat_map(|s| s.to_le_bytes()).collect();
+        let samples = decode_wav_16k_mono(&wav(3, 1, 16_000, 32, &[], &payload)).unwrap();
+        assert_eq!(samples, vec![0.25, -0.75]);
+    }
+
+    #[test]
+    fn wav_skips_odd_sized_chunk() {
+        // A 3-byte LIST chunk plus its pad byte sits between fmt and data.
+        let extra = [b"LIST".as_slice(), &3u32.to_le_bytes(), b"abc", &[0]].concat();
+        let payload = 8192i16.to_le_bytes();
+        let samples = decode_wav_16k_mono(&wav(1, 1, 16_000, 16, &extra, &payload)).unwrap();
+        assert_eq!(samples, vec![0.25]);
+    }
+
+    #[test]
+    fn wav_other_layouts_fall_back() {
+        let payload = [0u8; 8];
+        assert!(decode_wav_16k_mono(&wav(1, 2, 16_000, 16, &[], &payload)).is_none());
+        assert!(decode_wav_16k_mono(&wav(1, 1, 44_100, 16, &[], &payload)).is_none());
+        assert!(decode_wav_16k_mono(&wav(1, 1, 16_000, 24, &[], &payload)).is_none());
+        assert!(decode_wav_16k_mono(b"OggS not a wav file").is_none());
+        assert!(decode_wav_16k_mono(b"RIFF\0\0\0\0WAVE").is_none());
+    }
+
+    #[test]
+    fn wav_layout_from_header_prefix() {
+        let payload = [0u8; 64];
+        let file = wav(1, 1, 16_000, 16, &[], &payload);
+        let header = &file[..file.len() - payload.len()];
+        let layout = wav_16k_mono_layout(header).unwrap();
+        assert_eq!((layout.tag, layout.data_start, layout.data_len), (1, header.len(), 64));
+
+        let file = wav(1, 2, 44_100, 16, &[], &payload);
+        assert!(wav_16k_mono_layout(&file[..file.len() - payload.len()]).is_none());
+    }
+
+    #[test]
+    fn file_decode_reads_16k_mono_wav_in_process() {
+        let payload: Vec<u8> = [16384i16, -16384].iter().flat_map(|s| s.to_le_bytes()).collect();
+        let mut tmp = NamedTempFile::new().unwrap();
+        tmp.write_all(&wav(1, 1, 16_000, 16, &[], &payload)).unwrap();
+        assert_eq!(decode_file_to_pcm(tmp.path()).unwrap(), vec![0.5, -0.5]);
+    }
+}
@@ -3,6 +3,10 @@ use clap::{ArgMatches, Parser};
 use serde::Deserialize;
 use std::path::{Path, PathBuf};
 
+/// Upper bound for the automatically chosen long-form worker thread count.
+/// Matches the worker's previous fixed thread count.
+const MAX_AUTO_LONGFORM_THREADS: usize = 8;
+
 /// Telemuze: Self-hosted AI dictation and transcription server.
 #[derive(Parser, Debug, Clone)]
 #[command(name = "telemuze", version)]
@@ -71,6 +75,12 @@ pub struct Config {
     #[arg(long, env = "TELEMUZE_MAX_LONGFORM_CONCURRENCY", default_value_t = 1)]
     pub max_longform_concurrency: usize,
 
+    /// Number of inference threads for the long-form worker's STT model.
+    /// 0 (the default) picks the number of CPUs this process may run on,
+    /// honouring affinity masks and container CPU quotas, capped at 8.
+    #[arg(long, env = "TELEMUZE_LONGFORM_NUM_THREADS", default_value_t = 0)]
+    pub longform_num_threads: i32,
+
     /// Directory for storing downloaded models.
     /// Defaults to ~/.local/share/telemuze/models
     #[arg(long, env = "TELEMUZE_MODELS_DIR")]
@@ -124,6 +134,13 @@ pub struct Config {
     #[arg(long, env = "TELEMUZE_FUZZY_THRESHOLD", default_value_t = 0.85)]
     pub fuzzy_threshold: f64,
 
+    /// Transducer decoding method: "modified_beam_search" (default) or
+    /// "greedy_search". Greedy is cheaper per segment but ignores hotwords
+    /// and max-active-paths.
+    #[arg(long, env = "TELEMUZE_DECODING_METHOD", default_value = "modified_beam_search",
+           value_parser = clap::builder::PossibleValuesParser::new(["modified_beam_search", "greedy_search"]))]
+    pub decoding_method: String,
+
     /// Score boost applied to hotwords during recognition (0.0 = disabled).
     /// Requires modified_beam_search decoding. Typical range: 1.0–4.0.
     #[arg(long, env = "TELEMUZE_HOTWORDS_SCORE", default_value_t = 1.5)]
@@ -140,6 +157,12 @@ pub struct Config {
     #[arg(long, env = "TELEMUZE_BLANK_PENALTY", default_value_t = 0.0)]
     pub blank_penalty: f32,
 
+    /// Number of inference threads for the server's in-process STT model
+    /// (dictation and short clips). Segments are short, so a few threads
+    /// saturate them; more mostly adds synchronization overhead.
+    #[arg(long, env = "TELEMUZE_STT_NUM_THREADS", default_value_t = 2)]
+    pub stt_num_threads: i32,
+
     /// Telegram API ID (from https://my.telegram.org)
     #[arg(long, env = "TELEGRAM_API_ID", default_value_t = 0)]
     pub telegram_api_id: i32,
@@ -182,6 +205,19 @@ impl Config {
         }
     }
 
+    /// Resolved long-form worker thread count. An explicit value wins;
+    /// otherwise use the CPUs available to this process, which avoids
+    /// oversubscribing a container limited to fewer cores than the host.
+    pub fn resolved_longform_num_threads(&self) -> i32 {
+        if self.longform_num_threads > 0 {
+            return self.longform_num_threads;
+        }
+        std::thread::available_parallelism()
+            .map(|n| n.get())
+            .unwrap_or(1)
+            .min(MAX_AUTO_LONGFORM_THREADS) as i32
+    }
+
     /// Resolved terms file path, defaulting to
     /// `~/.config/telemuze/terms.txt`.
     pub fn resolved_terms_file(&self) -> PathBuf {
@@ -212,6 +248,7 @@ pub struct FileConfig {
     pub diarize_binary: Option<PathBuf>,
     pub longform_binary: Option<PathBuf>,
     pub max_longform_concurrency: Option<usize>,
+    pub longform_num_threads: Option<i32>,
     pub models_dir: Option<PathBuf>,
     pub enable_llm_correction: Option<bool>,
     pub llm_api_url: Option<String>,
@@ -222,9 +259,11 @@ pub struct FileConfig {
     pub disable_phonetic_match: Option<bool>,
     pub disable_fuzzy_match: Option<bool>,
     pub fuzzy_threshold: Option<f64>,
+    pub decoding_method: Option<String>,
     pub hotwords_score: Option<f32>,
     pub max_active_paths: Option<i32>,
     pub blank_penalty: Option<f32>,
+    pub stt_num_threads: Option<i32>,
     pub telegram_api_id: Option<i32>,
     pub telegram_api_hash: Option<String>,
     pub telegram_bot_token: Option<String>,
@@ -313,6 +352,7 @@ pub fn resolve(mut cli: Config, matches: &ArgMatches) -> Result<(Config, Option<
     merge_opt!(diarize_binary, "diarize-binary");
     merge_opt!(longform_binary, "longform-binary");
     merge!(max_longform_concurrency, "max-longform-concurrency");
+    merge!(longform_num_threads, "longform-num-threads");
     merge_opt!(models_dir, "models-dir");
     merge!(enable_llm_correction, "enable-llm-correction");
     merge!(llm_api_url, "llm-api-url");
@@ -323,9 +363,11 @@ pub fn resolve(mut cli: Config, matches: &ArgMatches) -> Result<(Config, Option<
     merge!(disable_phonetic_match, "disable-phonetic-match");
     merge!(disable_fuzzy_match, "disable-fuzzy-match");
     merge!(fuzzy_threshold, "fuzzy-threshold");
+    merge!(decoding_method, "decoding-method");
     merge!(hotwords_score, "hotwords-score");
     merge!(max_active_paths, "max-active-paths");
     merge!(blank_penalty, "blank-penalty");
+    merge!(stt_num_threads, "stt-num-threads");
     merge!(telegram_api_id, "telegram-api-id");
     merge!(telegram_api_hash, "telegram-api-hash");
     merge!(telegram_bot_token, "telegram-bot-token");
@@ -388,6 +430,9 @@ pub fn dump(cfg: &Config) -> String {
     line(&opt_path(&cfg.longform_binary, "longform-binary"));
     line("# Max concurrent long-form jobs. Additional jobs queue FIFO.");
     line(&format!("max-longform-concurrency = {}", cfg.max_longform_concurrency));
+    line("# STT inference threads per long-form worker. 0 = CPUs available to");
+    line("# this process (affinity / container quota aware), capped at 8.");
+    line(&format!("longform-num-threads = {}", cfg.longform_num_threads));
     line("");
 
     line("# ── LLM correction (opt-in) ───────────────────────────────────────────────");
@@ -425,12 +470,16 @@ pub fn dump(cfg: &Config) -> String {
     line("");
 
     line("# ── STT decoding ──────────────────────────────────────────────────────────");
+    line("# \"modified_beam_search\" or \"greedy_search\" (faster, no hotword support).");
+    line(&format!("decoding-method = \"{}\"", cfg.decoding_method));
     line("# Hotword score boost during recognition (0.0 disables; typical 1.0–4.0).");
     line(&format!("hotwords-score = {}", cfg.hotwords_score));
     line("# Beam search width (1–10). Lower is faster, may reduce accuracy.");
     line(&format!("max-active-paths = {}", cfg.max_active_paths));
     line("# Blank-token penalty; positive slows frame advance, negative speeds it.");
     line(&format!("blank-penalty = {}", cfg.blank_penalty));
+    line("# Inference threads for the in-process STT model (dictation, short clips).");
+    line(&format!("stt-num-threads = {}", cfg.stt_num_threads));
     line("");
 
     line("# ── Telegram bot (optional) ───────────────────────────────────────────────");
@@ -13,7 +13,7 @@ use tracing::{debug, error, info};
 
 use crate::audio;
 use crate::engines::dictionary;
-use crate::state::AppState;
+use crate::state::{run_blocking, AppState};
 
 pub fn router() -> Router<Arc<AppState>> {
     Router::new()
@@ -84,7 +84,7 @@ async fn handle_smart_dictation(
             }
         }
     } else {
-        match audio::decode_to_pcm(&file_data) {
+        match run_blocking(move || audio::decode_to_pcm(&file_data)).await {
             Ok(p) => p,
             Err(e) => {
                 error!("Audio decode failed: {e}");
@@ -102,7 +102,16 @@ async fn handle_smart_dictation(
     }
 
     // Step 2: STT transcription
-    let raw_text = match state.stt_engine.lock().unwrap().transcribe_with_hotwords(&pcm, hotwords.as_deref()) {
+    let stt_state = state.clone();
+    let stt_result = run_blocking(move || {
+        stt_state
+            .stt_engine
+            .lock()
+            .unwrap()
+            .transcribe_with_hotwords(&pcm, hotwords.as_deref())
+    })
+    .await;
+    let raw_text = match stt_result {
         Ok(result) => result.text,
         Err(e) => {
             error!("STT failed: {e}");
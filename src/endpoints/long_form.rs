@@ -5,7 +5,8 @@
 //! Handles hour-long podcasts, Zoom meetings, and video files.
 //! Uses VAD to chunk audio into speech segments, transcribes each
 //! segment independently, and returns timestamped results.
-//! Bypasses the LLM for speed and exact timing accuracy.
+//! Bypasses the LLM for speed and exact timing accuracy. Clips of 60 s
+//! or less run on the in-process engines unless diarization is configured.
 
 use axum::extract::{Multipart, State};
 use axum::http::StatusCode;
@@ -18,7 +19,7 @@ use tracing::{error, info};
 
 use crate::audio;
 use crate::long_form;
-use crate::state::AppState;
+use crate::state::{run_blocking, AppState};
 
 #[derive(Serialize)]
 struct LongFormResponse {
@@ -97,7 +98,7 @@ async fn handle_long_form(
     info!("Long-form transcription request: {} bytes", file_data.len());
 
     // Step 1: Decode to PCM
-    let pcm = match audio::decode_to_pcm(&file_data) {
+    let pcm = match run_blocking(move || audio::decode_to_pcm(&file_data)).await {
         Ok(p) => p,
         Err(e) => {
             error!("Audio decode failed: {e}");
@@ -116,8 +117,19 @@ async fn handle_long_form(
         info!("Hotwords: {:?}", hotwords.as_deref().unwrap());
     }
 
-    // Delegate queueing, tempfile, subprocess spawns, and join.
-    let outcome = match state.long_form_transcribe(&pcm, hotwords.as_deref()).await {
+    // Short clips gain nothing from the worker unless they need speaker
+    // labels, so run them on the already-loaded engines. Otherwise delegate
+    // queueing, the worker subprocess, and join.
+    let outcome = if duration_secs <= long_form::LONG_FORM_THRESHOLD_SECS
+        && !state.long_form_engine.has_diarization()
+    {
+        let state = state.clone();
+        run_blocking(move || state.short_form_transcribe(&pcm, hotwords.as_deref())).await
+    } else {
+        let ticket = state.long_form_queue.join();
+        state.long_form_transcribe(ticket, pcm, hotwords.as_deref()).await
+    };
+    let outcome = match outcome {
         Ok(o) => o,
         Err(e) => {
             error!("Long-form transcription failed: {e}");
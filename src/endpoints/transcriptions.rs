@@ -16,7 +16,7 @@ use std::sync::Arc;
 use tracing::{error, info};
 
 use crate::audio;
-use crate::state::AppState;
+use crate::state::{run_blocking, AppState};
 
 #[derive(Serialize)]
 struct TranscriptionResponse {
@@ -97,7 +97,7 @@ async fn handle_transcription(
             }
         }
     } else {
-        match audio::decode_to_pcm(&file_data) {
+        match run_blocking(move || audio::decode_to_pcm(&file_data)).await {
             Ok(p) => p,
             Err(e) => {
                 error!("Audio decode failed: {e}");
@@ -115,7 +115,15 @@ async fn handle_transcription(
     }
 
     // Run STT (no LLM correction for OpenAI compatibility)
-    match state.stt_engine.lock().unwrap().transcribe_with_hotwords(&pcm, hotwords.as_deref()) {
+    let stt_result = run_blocking(move || {
+        state
+            .stt_engine
+            .lock()
+            .unwrap()
+            .transcribe_with_hotwords(&pcm, hotwords.as_deref())
+    })
+    .await;
+    match stt_result {
         Ok(result) => {
             info!("Transcription complete: {} chars", result.text.len());
             Json(TranscriptionResponse { text: result.text }).into_response()
@@ -177,7 +177,11 @@ impl LlmEngine {
 
         match &self.inner {
             LlmInner::Native(state) => {
-                Self::correct_native(state, raw_text, terms_content, candidate_hints)
+                // Local inference is CPU-bound for hundreds of milliseconds;
+                // let tokio move other tasks off this worker thread meanwhile.
+                tokio::task::block_in_place(|| {
+                    Self::correct_native(state, raw_text, terms_content, candidate_hints)
+                })
             }
             LlmInner::Http { client, api_url } => {
                 Self::correct_http(client, api_url, raw_text, terms_content, candidate_hints)
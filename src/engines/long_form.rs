@@ -1,19 +1,29 @@
 //! Long-form transcription engine: spawns a one-shot `telemuze transcribe`
 //! worker subprocess that loads VAD + STT (and optionally Sortformer
-//! diarization), processes a raw PCM tempfile, and exits. The always-on
-//! server never pays the worker's memory cost.
+//! diarization), processes raw PCM streamed over its stdin, and exits. The
+//! always-on server never pays the worker's memory cost.
 
 use anyhow::{bail, Context, Result};
 use serde::Deserialize;
-use std::io::Write;
-use std::path::{Path, PathBuf};
-use std::process::Command;
+use std::collections::{HashSet, VecDeque};
+use std::io::{BufRead, BufReader, Write};
+use std::path::PathBuf;
+use std::process::{ChildStderr, ChildStdin, Command, Stdio};
+use std::sync::{Arc, Mutex};
 use tempfile::NamedTempFile;
-use tracing::debug;
+use tracing::{debug, info};
 
 use crate::engines::diarization::DiarSegment;
 use crate::state::TranscribedSegment;
 
+/// Largest hotwords list passed to the worker inline as an argument.
+/// Bigger lists go through a tempfile, since Linux caps a single argument
+/// at 128 KiB.
+const MAX_INLINE_HOTWORDS_BYTES: usize = 32 * 1024;
+
+/// Number of trailing worker stderr lines kept for error messages.
+const STDERR_TAIL_LINES: usize = 20;
+
 #[derive(Deserialize)]
 struct WireSegment {
     start: f64,
@@ -44,16 +54,28 @@ pub struct LongFormResult {
     pub diar: Option<Vec<DiarSegment>>,
 }
 
+/// PIDs of running workers, so shutdown can kill them instead of leaving
+/// them decoding (and holding a worker's RAM) after the server is gone.
+#[derive(Default)]
+struct LiveWorkers {
+    pids: HashSet<u32>,
+    /// Set by `kill_workers`; later spawns are killed straight away.
+    closed: bool,
+}
+
 #[derive(Clone)]
 pub struct LongFormEngine {
     binary_path: PathBuf,
     stt_model_dir: PathBuf,
     vad_model_path: PathBuf,
     diarize_model_path: Option<PathBuf>,
+    decoding_method: String,
     hotwords_score: f32,
     max_active_paths: i32,
     blank_penalty: f32,
     num_threads: i32,
+    /// Shared by every clone, so all jobs register in one place.
+    workers: Arc<Mutex<LiveWorkers>>,
 }
 
 impl LongFormEngine {
@@ -62,6 +84,7 @@ impl LongFormEngine {
         stt_model_dir: PathBuf,
         vad_model_path: PathBuf,
         diarize_model_path: Option<PathBuf>,
+        decoding_method: String,
         hotwords_score: f32,
         max_active_paths: i32,
         blank_penalty: f32,
@@ -72,23 +95,47 @@ impl LongFormEngine {
             stt_model_dir,
             vad_model_path,
             diarize_model_path,
+            decoding_method,
             hotwords_score,
             max_active_paths,
             blank_penalty,
             num_threads,
+            workers: Arc::default(),
+        }
+    }
+
+    /// Kill every running worker and refuse new ones. Called on shutdown;
+    /// the jobs waiting on them fail with the worker's exit status.
+    pub fn kill_workers(&self) {
+        let mut workers = self.workers.lock().unwrap();
+        workers.closed = true;
+        for &pid in &workers.pids {
+            kill_worker(pid);
+        }
+        if !workers.pids.is_empty() {
+            info!("Killed {} long-form worker(s)", workers.pids.len());
         }
     }
 
-    /// Run the long-form worker on an already-materialized raw f32-LE PCM
-    /// tempfile. Returns ASR segments and, when a diarization model is
-    /// configured, the matching speaker segments.
+    /// Whether workers also run Sortformer diarization.
+    pub fn has_diarization(&self) -> bool {
+        self.diarize_model_path.is_some()
+    }
+
+    /// Run the long-form worker on mono 16 kHz PCM, streaming the samples
+    /// to its stdin as raw f32-LE. Returns ASR segments and, when a
+    /// diarization model is configured, the matching speaker segments.
     pub fn transcribe_and_diarize(
         &self,
-        pcm_path: &Path,
+        pcm: &[f32],
         hotwords: Option<&str>,
     ) -> Result<LongFormResult> {
+        // Hotwords normally travel inline on the command line. Only lists
+        // too large for one argument, or containing NUL bytes (which argv
+        // cannot carry), are written to a tempfile.
+        let hotwords = hotwords.filter(|hw| !hw.is_empty());
         let hotwords_tmp = match hotwords {
-            Some(hw) if !hw.is_empty() => {
+            Some(hw) if hw.len() > MAX_INLINE_HOTWORDS_BYTES || hw.contains('\0') => {
                 let mut tmp = NamedTempFile::new().context("Failed to create hotwords tempfile")?;
                 tmp.write_all(hw.as_bytes())
                     .context("Failed to write hotwords tempfile")?;
@@ -99,9 +146,9 @@ impl LongFormEngine {
         };
 
         debug!(
-            "Spawning long-form worker {} on pcm path {}",
+            "Spawning long-form worker {} on {} samples",
             self.binary_path.display(),
-            pcm_path.display()
+            pcm.len()
         );
 
         let mut cmd = Command::new(&self.binary_path);
@@ -111,7 +158,9 @@ impl LongFormEngine {
             .arg("--vad-model")
             .arg(&self.vad_model_path)
             .arg("--pcm")
-            .arg(pcm_path)
+            .arg("-")
+            .arg("--decoding-method")
+            .arg(&self.decoding_method)
             .arg("--hotwords-score")
             .arg(self.hotwords_score.to_string())
             .arg("--max-active-paths")
@@ -127,34 +176,73 @@ impl LongFormEngine {
 
         if let Some(ref tmp) = hotwords_tmp {
             cmd.arg("--hotwords-file").arg(tmp.path());
+        } else if let Some(hw) = hotwords {
+            cmd.arg("--hotwords").arg(hw);
         }
 
-        let output = cmd.output().with_context(|| {
-            format!(
-                "Failed to spawn long-form worker: {}",
-                self.binary_path.display()
-            )
-        })?;
+        let mut child = cmd
+            .stdin(Stdio::piped())
+            .stdout(Stdio::piped())
+            .stderr(Stdio::piped())
+            .spawn()
+            .with_context(|| {
+                format!(
+                    "Failed to spawn long-form worker: {}",
+                    self.binary_path.display()
+                )
+            })?;
+
+        // Feed stdin and drain stderr from separate threads while this one
+        // parses the JSON result straight off stdout, so no pipe can stall
+        // and the payload is never buffered whole. The worker starts loading
+        // models as soon as it is spawned, overlapping the transfer.
+        let stdin = child.stdin.take().context("Worker stdin was not piped")?;
+        let stdout = child.stdout.take().context("Worker stdout was not piped")?;
+        let stderr_pipe = child.stderr.take().context("Worker stderr was not piped")?;
 
-        if !output.stderr.is_empty() {
-            for line in String::from_utf8_lossy(&output.stderr).lines() {
-                debug!("transcribe: {}", line);
+        let pid = child.id();
+        {
+            let mut workers = self.workers.lock().unwrap();
+            if workers.closed {
+                kill_worker(pid);
+            } else {
+                workers.pids.insert(pid);
             }
         }
 
-        if !output.status.success() {
-            let stderr = String::from_utf8_lossy(&output.stderr);
+        let (write_result, stderr_tail, parsed) = std::thread::scope(|scope| {
+            let writer = scope.spawn(move || write_pcm(stdin, pcm));
+            let stderr_reader = scope.spawn(move || drain_stderr(stderr_pipe));
+            let mut reader = BufReader::new(stdout);
+            let parsed = serde_json::from_reader::<_, WireOutput>(&mut reader);
+            if parsed.is_err() {
+                // Keep draining so a worker still writing cannot block.
+                let _ = std::io::copy(&mut reader, &mut std::io::sink());
+            }
+            (writer.join(), stderr_reader.join().unwrap_or_default(), parsed)
+        });
+        // Deregister before reaping: until `wait` the PID cannot be reused,
+        // so `kill_workers` can never signal an unrelated process.
+        wait_exited(pid);
+        self.workers.lock().unwrap().pids.remove(&pid);
+        let status = child.wait().context("Failed to wait for long-form worker")?;
+
+        if !status.success() {
             bail!(
                 "telemuze transcribe exited with status {}: {}",
-                output.status,
-                stderr.trim()
+                status,
+                stderr_tail.trim()
             );
         }
 
-        let stdout = std::str::from_utf8(&output.stdout)
-            .context("telemuze transcribe stdout was not valid UTF-8")?;
-        let parsed: WireOutput = serde_json::from_str(stdout.trim())
-            .context("Failed to parse telemuze transcribe JSON output")?;
+        // Only meaningful once the worker succeeded: a worker that died
+        // early also breaks the pipe, and its exit status is the better
+        // error to report.
+        write_result
+            .map_err(|_| anyhow::anyhow!("PCM writer thread panicked"))?
+            .context("Failed to stream PCM to long-form worker")?;
+
+        let parsed = parsed.context("Failed to parse telemuze transcribe JSON output")?;
 
         drop(hotwords_tmp);
 
@@ -183,3 +271,84 @@ impl LongFormEngine {
         Ok(LongFormResult { segments, diar })
     }
 }
+
+/// Send SIGKILL to a worker. It holds no state worth flushing.
+#[cfg(unix)]
+fn kill_worker(pid: u32) {
+    unsafe {
+        libc::kill(pid as libc::pid_t, libc::SIGKILL);
+    }
+}
+
+#[cfg(not(unix))]
+fn kill_worker(_pid: u32) {}
+
+/// Block until the worker has exited, without reaping it.
+#[cfg(unix)]
+fn wait_exited(pid: u32) {
+    loop {
+        let mut info: libc::siginfo_t = unsafe { std::mem::zeroed() };
+        let rc = unsafe {
+            libc::waitid(
+                libc::P_PID,
+                pid as libc::id_t,
+                &mut info,
+                libc::WEXITED | libc::WNOWAIT,
+            )
+        };
+        if rc == 0 || std::io::Error::last_os_error().kind() != std::io::ErrorKind::Interrupted {
+            return;
+        }
+    }
+}
+
+#[cfg(not(unix))]
+fn wait_exited(_pid: u32) {}
+
+/// Forward the worker's stderr to the debug log line by line as it runs,
+/// returning only the last `STDERR_TAIL_LINES` lines for error reporting
+/// so a long job's log is never held in memory whole.
+fn drain_stderr(stderr: ChildStderr) -> String {
+    let mut tail: VecDeque<String> = VecDeque::with_capacity(STDERR_TAIL_LINES);
+    let mut reader = BufReader::new(stderr);
+    let mut buf = Vec::new();
+    loop {
+        buf.clear();
+        match reader.read_until(b'\n', &mut buf) {
+            Ok(0) | Err(_) => break,
+            Ok(_) => {}
+        }
+        let line = String::from_utf8_lossy(&buf);
+        let line = line.trim_end();
+        debug!("transcribe: {}", line);
+        if tail.len() == STDERR_TAIL_LINES {
+            tail.pop_front();
+        }
+        tail.push_back(line.to_string());
+    }
+    Vec::from(tail).join("\n")
+}
+
+/// Write mono f32 PCM to the worker's stdin as raw f32-LE bytes, closing
+/// the pipe when done so the worker sees EOF.
+///
+/// On little-endian targets the in-memory samples already are f32-LE, so
+/// the buffer is written to the pipe as-is without an intermediate copy.
+#[cfg(target_endian = "little")]
+fn write_pcm(mut stdin: ChildStdin, pcm: &[f32]) -> std::io::Result<()> {
+    // Safety: f32 has no padding or invalid bit patterns, and u8 has
+    // alignment 1, so viewing the samples as bytes is sound.
+    let bytes = unsafe {
+        std::slice::from_raw_parts(pcm.as_ptr().cast::<u8>(), std::mem::size_of_val(pcm))
+    };
+    stdin.write_all(bytes)
+}
+
+#[cfg(not(target_endian = "little"))]
+fn write_pcm(stdin: ChildStdin, pcm: &[f32]) -> std::io::Result<()> {
+    let mut writer = std::io::BufWriter::with_capacity(64 * 1024, stdin);
+    for sample in pcm {
+        writer.write_all(&sample.to_le_bytes())?;
+    }
+    writer.flush()
+}
@@ -3,7 +3,7 @@
 //! Uses the Parakeet TDT ONNX model via sherpa-onnx's OfflineRecognizer
 //! for fast, accurate speech recognition.
 
-use anyhow::{Context, Result};
+use anyhow::{bail, Context, Result};
 use sherpa_onnx::{OfflineRecognizer, OfflineRecognizerConfig};
 use std::path::Path;
 use std::time::Instant;
@@ -20,8 +20,13 @@ pub struct SttResult {
 
 /// Wraps the sherpa-onnx OfflineRecognizer for Parakeet TDT inference.
 pub struct SttEngine {
-    /// Primary recognizer using modified_beam_search (supports hotwords).
+    /// Recognizer using the configured decoding method. Only
+    /// modified_beam_search applies hotwords.
     recognizer: OfflineRecognizer,
+    /// Name of the decoding method, for logging.
+    decoding_method: String,
+    /// Whether the decoding method supports per-stream hotwords.
+    supports_hotwords: bool,
 }
 
 // Safety: The underlying ONNX runtime session is thread-safe for inference.
@@ -38,13 +43,24 @@ impl SttEngine {
     /// - joiner.int8.onnx
     /// - tokens.txt
     /// - bpe.vocab (for hotword support)
+    ///
+    /// `decoding_method` is `modified_beam_search` or `greedy_search`.
     pub fn new(
         model_dir: &Path,
+        decoding_method: &str,
         hotwords_score: f32,
         max_active_paths: i32,
         blank_penalty: f32,
         num_threads: i32,
     ) -> Result<Self> {
+        let supports_hotwords = match decoding_method {
+            "modified_beam_search" => true,
+            "greedy_search" => false,
+            other => bail!(
+                "Unknown decoding method {other:?} (expected modified_beam_search or greedy_search)"
+            ),
+        };
+
         let mut config = OfflineRecognizerConfig::default();
         config.model_config.transducer.encoder =
             Some(model_dir.join("encoder.int8.onnx").to_string_lossy().into_owned());
@@ -56,7 +72,7 @@ impl SttEngine {
             Some(model_dir.join("tokens.txt").to_string_lossy().into_owned());
         config.model_config.model_type = Some("nemo_transducer".into());
         config.model_config.num_threads = num_threads;
-        config.decoding_method = Some("modified_beam_search".into());
+        config.decoding_method = Some(decoding_method.into());
         config.max_active_paths = max_active_paths;
         config.blank_penalty = blank_penalty;
         config.hotwords_score = hotwords_score;
@@ -73,14 +89,20 @@ impl SttEngine {
         }
 
         info!(
-            "Creating beam_search recognizer (hotwords_score={hotwords_score}, \
+            "Creating {decoding_method} recognizer (hotwords_score={hotwords_score}, \
              max_active_paths={max_active_paths}, blank_penalty={blank_penalty}, \
              num_threads={num_threads})"
         );
         let recognizer = OfflineRecognizer::create(&config)
-            .context("Failed to create sherpa-onnx OfflineRecognizer (beam search)")?;
+            .with_context(|| {
+                format!("Failed to create sherpa-onnx OfflineRecognizer ({decoding_method})")
+            })?;
 
-        Ok(Self { recognizer })
+        Ok(Self {
+            recognizer,
+            decoding_method: decoding_method.to_string(),
+            supports_hotwords,
+        })
     }
 
     /// Transcribe mono 16kHz f32 PCM audio to text.
@@ -93,6 +115,7 @@ impl SttEngine {
     /// `hotwords` should be one word/phrase per line in sherpa-onnx format.
     /// Sherpa-onnx handles BPE tokenization internally when `bpe.vocab` is
     /// configured, so hotwords can be plain words (e.g. "PRESS ENTER").
+    /// Hotwords are ignored under greedy_search.
     pub fn transcribe_with_hotwords(
         &self,
         pcm_16khz: &[f32],
@@ -101,6 +124,10 @@ impl SttEngine {
         let audio_duration_secs = pcm_16khz.len() as f64 / 16_000.0;
 
         let stream = match hotwords {
+            Some(hw) if !hw.is_empty() && !self.supports_hotwords => {
+                debug!("Ignoring hotwords: {} does not support them", self.decoding_method);
+                self.recognizer.create_stream()
+            }
             Some(hw) if !hw.is_empty() => {
                 debug!(hotwords = %hw, "Passing hotwords to sherpa-onnx");
                 self.recognizer.create_stream_with_hotwords(hw)
@@ -112,7 +139,8 @@ impl SttEngine {
         let start = Instant::now();
         self.recognizer.decode(&stream);
         info!(
-            "Beam search decode completed in {:?} ({audio_duration_secs:.1}s audio)",
+            "{} decode completed in {:?} ({audio_duration_secs:.1}s audio)",
+            self.decoding_method,
             start.elapsed()
         );
 
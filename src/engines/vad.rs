@@ -60,46 +60,69 @@ impl VadEngine {
     }
 
     /// Segment mono 16kHz audio into speech chunks.
+    pub fn segment_audio(&self, pcm_16khz: &[f32]) -> Result<Vec<SpeechSegment>> {
+        let mut segments = Vec::new();
+        self.for_each_segment(pcm_16khz, |seg| {
+            segments.push(seg);
+            Ok(())
+        })?;
+        Ok(segments)
+    }
+
+    /// Segment mono 16kHz audio, handing each speech chunk to `on_segment`
+    /// as soon as the detector closes it rather than after the whole file
+    /// has been scanned. Lets callers overlap STT with the remaining VAD
+    /// work. An error from `on_segment` stops segmentation early.
     ///
     /// Creates a fresh VAD detector per call to avoid state accumulation.
     /// Feeds audio in 512-sample frames, then flushes trailing speech.
-    pub fn segment_audio(&self, pcm_16khz: &[f32]) -> Result<Vec<SpeechSegment>> {
+    pub fn for_each_segment(
+        &self,
+        pcm_16khz: &[f32],
+        mut on_segment: impl FnMut(SpeechSegment) -> Result<()>,
+    ) -> Result<()> {
         let buffer_secs = pcm_16khz.len() as f32 / SAMPLE_RATE as f32 + 1.0;
         let vad = VoiceActivityDetector::create(&self.config, buffer_secs)
             .context("Failed to create VAD detector")?;
 
+        // Drain whatever segments the detector has closed so far.
+        let mut emitted = 0usize;
+        let mut drain = || -> Result<()> {
+            while !vad.is_empty() {
+                if let Some(seg) = vad.front() {
+                    let start_secs = seg.start() as f64 / SAMPLE_RATE as f64;
+                    let duration_secs = seg.n() as f64 / SAMPLE_RATE as f64;
+                    on_segment(SpeechSegment {
+                        start_secs,
+                        end_secs: start_secs + duration_secs,
+                        samples: seg.samples().to_vec(),
+                    })?;
+                    emitted += 1;
+                }
+                vad.pop();
+            }
+            Ok(())
+        };
+
         // Feed audio in window-sized chunks.
         for chunk in pcm_16khz.chunks(WINDOW_SIZE as usize) {
             if chunk.len() == WINDOW_SIZE as usize {
                 vad.accept_waveform(chunk);
+                drain()?;
             }
         }
         vad.flush();
-
-        // Drain detected segments.
-        let mut segments = Vec::new();
-        while !vad.is_empty() {
-            if let Some(seg) = vad.front() {
-                let start_secs = seg.start() as f64 / SAMPLE_RATE as f64;
-                let duration_secs = seg.n() as f64 / SAMPLE_RATE as f64;
-                segments.push(SpeechSegment {
-                    start_secs,
-                    end_secs: start_secs + duration_secs,
-                    samples: seg.samples().to_vec(),
-                });
-            }
-            vad.pop();
-        }
+        drain()?;
 
         // If VAD found no segments, treat entire audio as one.
-        if segments.is_empty() && !pcm_16khz.is_empty() {
-            segments.push(SpeechSegment {
+        if emitted == 0 && !pcm_16khz.is_empty() {
+            on_segment(SpeechSegment {
                 start_secs: 0.0,
                 end_secs: pcm_16khz.len() as f64 / SAMPLE_RATE as f64,
                 samples: pcm_16khz.to_vec(),
-            });
+            })?;
         }
 
-        Ok(segments)
+        Ok(())
     }
 }
@@ -1,15 +1,161 @@
-//! Shared long-form finalize + formatting logic used by both the HTTP
-//! long-form endpoint and the Telegram bot's >60 s path.
+//! Shared long-form queueing, finalize + formatting logic used by both the
+//! HTTP long-form endpoint and the Telegram bot's >60 s path.
+
+use std::collections::VecDeque;
+use std::fmt::Write;
+use std::sync::atomic::{AtomicU64, Ordering};
+use std::sync::{Arc, Mutex};
+use std::time::{Duration, Instant};
+
+use anyhow::{Context, Result};
+use tokio::sync::{watch, OwnedSemaphorePermit, Semaphore};
+use tracing::info;
 
 use crate::engines::diarization::{split_by_speakers, DiarSegment, SpeakerSubSegment};
 use crate::state::TranscribedSegment;
 
+/// Duration threshold (seconds) above which audio is routed through the
+/// long-form subprocess pipeline. Below this the in-process VAD+STT loop
+/// used for voice dictations is cheaper than spawning a worker.
+pub const LONG_FORM_THRESHOLD_SECS: f64 = 60.0;
+
 /// Result bundle returned from `AppState::long_form_transcribe`.
 pub struct LongFormOutcome {
     pub asr_segments: Vec<TranscribedSegment>,
     pub diar_segments: Option<Vec<DiarSegment>>,
 }
 
+/// FIFO admission queue for long-form jobs. Wraps the permit semaphore
+/// with the ordered list of waiting jobs. Only the job at the head of that
+/// list asks the semaphore for a permit, so jobs are admitted in join
+/// order (matching the position they were shown) no matter when each
+/// starts waiting, and a cancelled job leaves the line immediately.
+pub struct LongFormQueue {
+    permits: Arc<Semaphore>,
+    /// Ids of jobs that joined but have not been admitted, oldest first.
+    waiting: Mutex<VecDeque<u64>>,
+    next_id: AtomicU64,
+    /// Bumped whenever a job leaves `waiting`, i.e. whenever the jobs
+    /// behind it move up. Receivers only see the latest bump, so a burst
+    /// of departures wakes each watcher once.
+    moved: watch::Sender<()>,
+}
+
+impl LongFormQueue {
+    pub fn new(permits: usize) -> Self {
+        Self {
+            permits: Arc::new(Semaphore::new(permits)),
+            waiting: Mutex::new(VecDeque::new()),
+            next_id: AtomicU64::new(0),
+            moved: watch::channel(()).0,
+        }
+    }
+
+    /// Join the back of the queue.
+    pub fn join(self: &Arc<Self>) -> QueueTicket {
+        let id = self.next_id.fetch_add(1, Ordering::Relaxed);
+        self.waiting.lock().unwrap().push_back(id);
+        QueueTicket {
+            queue: Arc::clone(self),
+            id,
+            joined: Instant::now(),
+        }
+    }
+}
+
+/// A job's place in the `LongFormQueue`. Dropping it (admitted or not)
+/// removes the job from the waiting list.
+pub struct QueueTicket {
+    queue: Arc<LongFormQueue>,
+    id: u64,
+    joined: Instant,
+}
+
+impl QueueTicket {
+    /// 1-based position among waiting jobs, or `None` when a permit is free
+    /// and nobody is ahead, i.e. the job will start right away.
+    pub fn position(&self) -> Option<usize> {
+        let ahead = self
+            .queue
+            .waiting
+            .lock()
+            .unwrap()
+            .iter()
+            .position(|&id| id == self.id)
+            .unwrap_or(0);
+        if ahead == 0 && self.queue.permits.available_permits() > 0 {
+            None
+        } else {
+            Some(ahead + 1)
+        }
+    }
+
+    /// Follow this job's position while it waits. The watcher is separate
+    /// from the ticket so it can be polled alongside `admit`.
+    pub fn positions(&self) -> QueuePositions {
+        QueuePositions {
+            queue: Arc::clone(&self.queue),
+            id: self.id,
+            moved: self.queue.moved.subscribe(),
+        }
+    }
+
+    /// Whether this job is at the head of the waiting list.
+    fn is_next(&self) -> bool {
+        self.queue.waiting.lock().unwrap().front() == Some(&self.id)
+    }
+
+    /// Wait for this job's turn, then for a permit. The job leaves the
+    /// waiting list once admitted.
+    pub async fn admit(self) -> Result<OwnedSemaphorePermit> {
+        // Subscribe before checking, so a departure in between is not missed.
+        let mut moved = self.queue.moved.subscribe();
+        while !self.is_next() {
+            moved.changed().await.context("Long-form queue closed")?;
+        }
+        let permit = self
+            .queue
+            .permits
+            .clone()
+            .acquire_owned()
+            .await
+            .context("Long-form semaphore closed")?;
+        let waited = self.joined.elapsed();
+        if waited > Duration::from_millis(50) {
+            info!("Long-form job waited {:.1}s in queue", waited.as_secs_f64());
+        }
+        Ok(permit)
+    }
+}
+
+impl Drop for QueueTicket {
+    fn drop(&mut self) {
+        let mut waiting = self.queue.waiting.lock().unwrap();
+        if let Some(i) = waiting.iter().position(|&id| id == self.id) {
+            waiting.remove(i);
+            drop(waiting);
+            self.queue.moved.send_replace(());
+        }
+    }
+}
+
+/// Position updates for one queued job, from `QueueTicket::positions`.
+pub struct QueuePositions {
+    queue: Arc<LongFormQueue>,
+    id: u64,
+    moved: watch::Receiver<()>,
+}
+
+impl QueuePositions {
+    /// Wait until the queue moves, then return the job's new 1-based
+    /// position, or `None` once the job has left the waiting list.
+    pub async fn next(&mut self) -> Option<usize> {
+        self.moved.changed().await.ok()?;
+        let waiting = self.queue.waiting.lock().unwrap();
+        waiting.iter().position(|&id| id == self.id).map(|i| i + 1)
+    }
+}
+
 /// Merge ASR segments with diarization (if present) into speaker-labeled
 /// sub-segments. When diarization is absent each ASR segment becomes one
 /// sub-segment with `speaker = None`.
@@ -98,32 +244,36 @@ pub fn format_as_text(subs: &[SpeakerSubSegment]) -> String {
         return subs[0].text.trim().to_string();
     }
 
-    let mut out = String::new();
+    // Build in one buffer, sized for the text plus a short header per run.
+    let text_len: usize = subs.iter().map(|s| s.text.len()).sum();
+    let mut out = String::with_capacity(text_len + subs.len() * 32);
     for sub in subs {
         if !out.is_empty() {
             out.push_str("\n\n");
         }
-        let ts = format_timestamp(sub.start);
-        match sub.speaker {
-            Some(spk) => out.push_str(&format!("[{ts} — Speaker {}]\n", spk + 1)),
-            None => out.push_str(&format!("[{ts}]\n")),
+        out.push('[');
+        write_timestamp(&mut out, sub.start);
+        if let Some(spk) = sub.speaker {
+            let _ = write!(out, " — Speaker {}", spk + 1);
         }
+        out.push_str("]\n");
         out.push_str(sub.text.trim());
     }
     out
 }
 
-/// Format a timestamp in seconds as `H:MM:SS` (with hours) or `M:SS`.
-fn format_timestamp(secs: f64) -> String {
+/// Append a timestamp in seconds as `H:MM:SS` (with hours) or `M:SS`.
+fn write_timestamp(out: &mut String, secs: f64) {
     let total = secs as u64;
     let h = total / 3600;
     let m = (total % 3600) / 60;
     let s = total % 60;
-    if h > 0 {
-        format!("{h}:{m:02}:{s:02}")
+    // Writing to a String cannot fail.
+    let _ = if h > 0 {
+        write!(out, "{h}:{m:02}:{s:02}")
     } else {
-        format!("{m}:{s:02}")
-    }
+        write!(out, "{m}:{s:02}")
+    };
 }
 
 /// Human-readable audio duration used in status messages.
@@ -140,3 +290,115 @@ pub fn format_duration(secs: f64) -> String {
         format!("{s}s")
     }
 }
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    /// Let spawned tasks run up to their next await point.
+    async fn settle() {
+        tokio::time::sleep(Duration::from_millis(10)).await;
+    }
+
+    #[tokio::test]
+    async fn free_permit_admits_immediately() {
+        let queue = Arc::new(LongFormQueue::new(1));
+        let ticket = queue.join();
+        assert_eq!(ticket.position(), None);
+        let _permit = ticket.admit().await.unwrap();
+        assert!(queue.waiting.lock().unwrap().is_empty());
+    }
+
+    #[tokio::test]
+    async fn admits_in_join_order_regardless_of_wait_order() {
+        let queue = Arc::new(LongFormQueue::new(1));
+        let running = queue.join().admit().await.unwrap();
+        let first = queue.join();
+        let second = queue.join();
+        assert_eq!(first.position(), Some(1));
+        assert_eq!(second.position(), Some(2));
+
+        // The later job starts waiting before the earlier one.
+        let admitted = Arc::new(Mutex::new(Vec::new()));
+        let spawn_admit = |ticket: QueueTicket, n: u32| {
+            let admitted = Arc::clone(&admitted);
+            tokio::spawn(async move {
+                let permit = ticket.admit().await.unwrap();
+                admitted.lock().unwrap().push(n);
+                permit
+            })
+        };
+        let second_job = spawn_admit(second, 2);
+        settle().await;
+        let first_job = spawn_admit(first, 1);
+        settle().await;
+        assert!(admitted.lock().unwrap().is_empty());
+
+        drop(running);
+        let first_permit = first_job.await.unwrap();
+        settle().await;
+        assert_eq!(*admitted.lock().unwrap(), [1]);
+
+        drop(first_permit);
+        let _second_permit = second_job.await.unwrap();
+        assert_eq!(*admitted.lock().unwrap(), [1, 2]);
+    }
+
+    #[tokio::test]
+    async fn dropped_ticket_leaves_waiting() {
+        let queue = Arc::new(LongFormQueue::new(1));
+        let _running = queue.join().admit().await.unwrap();
+        let cancelled = queue.join();
+        let next = queue.join();
+        assert_eq!(next.position(), Some(2));
+
+        drop(cancelled);
+        assert_eq!(queue.waiting.lock().unwrap().len(), 1);
+        assert_eq!(next.position(), Some(1));
+    }
+
+    #[tokio::test]
+    async fn position_drops_when_job_ahead_is_admitted() {
+        let queue = Arc::new(LongFormQueue::new(1));
+        let running = queue.join().admit().await.unwrap();
+        let ahead = queue.join();
+        let behind = queue.join();
+        let mut positions = behind.positions();
+
+        let ahead_job = tokio::spawn(ahead.admit());
+        drop(running);
+        assert_eq!(positions.next().await, Some(1));
+        drop(ahead_job.await.unwrap().unwrap());
+        drop(behind);
+    }
+
+    #[tokio::test]
+    async fn departures_are_coalesced() {
+        let queue = Arc::new(LongFormQueue::new(1));
+        let _running = queue.join().admit().await.unwrap();
+        let first = queue.join();
+        let second = queue.join();
+        let last = queue.join();
+        let mut positions = last.positions();
+
+        drop(first);
+        drop(second);
+        assert_eq!(positions.next().await, Some(1));
+        // Both departures were delivered as a single wake-up.
+        let more = tokio::time::timeout(Duration::from_millis(20), positions.next()).await;
+        assert!(more.is_err());
+    }
+
+    #[tokio::test]
+    async fn positions_end_once_admitted() {
+        let queue = Arc::new(LongFormQueue::new(1));
+        let running = queue.join().admit().await.unwrap();
+        let ticket = queue.join();
+        let mut positions = ticket.positions();
+
+        let job = tokio::spawn(ticket.admit());
+        drop(running);
+        assert_eq!(positions.next().await, None);
+        assert!(job.await.unwrap().is_ok());
+    }
+}
@@ -16,13 +16,19 @@ use clap::{CommandFactory, FromArgMatches};
 use std::net::{Ipv6Addr, SocketAddr, SocketAddrV6};
 use std::path::{Path, PathBuf};
 use std::sync::Arc;
+use std::time::Duration;
+use tokio::sync::watch;
 use tower_http::cors::CorsLayer;
 use tower_http::trace::TraceLayer;
-use tracing::info;
+use tracing::{info, warn};
 
 use crate::config::Config;
 use crate::state::AppState;
 
+/// How long in-flight HTTP requests may run after a shutdown signal before
+/// the server exits anyway. Kept under Docker's default 10 s stop timeout.
+const SHUTDOWN_GRACE: Duration = Duration::from_secs(5);
+
 fn main() -> Result<()> {
     let args: Vec<String> = std::env::args().collect();
     if args.get(1).map(String::as_str) == Some("transcribe") {
@@ -42,8 +48,17 @@ fn main() -> Result<()> {
     server_main()
 }
 
-#[tokio::main]
-async fn server_main() -> Result<()> {
+fn server_main() -> Result<()> {
+    let runtime = tokio::runtime::Runtime::new()?;
+    let result = runtime.block_on(run_server());
+    // Dropping the runtime would wait for every blocking task, including
+    // long-form jobs still running past the grace period (run_server has
+    // already killed their workers). Exit instead.
+    runtime.shutdown_background();
+    result
+}
+
+async fn run_server() -> Result<()> {
     tracing_subscriber::fmt()
         .with_env_filter(
             tracing_subscriber::EnvFilter::try_from_default_env()
@@ -81,10 +96,24 @@ async fn server_main() -> Result<()> {
     }
 
     info!("Telemuze starting up...");
-    info!("Loading models into memory...");
 
-    let state = AppState::new(&config).await?;
+    // Listen from the start: on a first run, downloading and loading the
+    // models can take minutes, and a stop request must not wait for that.
+    let shutdown = shutdown_signal();
+    tokio::pin!(shutdown);
+
+    info!("Loading models into memory...");
+    let state = tokio::select! {
+        state = AppState::new(&config) => state?,
+        () = &mut shutdown => {
+            info!("Shutting down during startup");
+            return Ok(());
+        }
+    };
     let shared_state = Arc::new(state);
+    // Long-form workers are separate processes that outlive the runtime,
+    // so they are killed explicitly on every way out of the server.
+    let long_form_engine = shared_state.long_form_engine.clone();
 
     let has_token = !config.telegram_bot_token.is_empty();
     let has_api_id = config.telegram_api_id != 0;
@@ -120,32 +149,98 @@ async fn server_main() -> Result<()> {
         .layer(CorsLayer::permissive())
         .with_state(shared_state);
 
-    match config.host.as_deref() {
-        Some(host) => {
-            let bind_addr = format!("{}:{}", host, config.port);
-            info!("Listening on {bind_addr}");
-            let listener = tokio::net::TcpListener::bind(&bind_addr).await?;
-            axum::serve(listener, app).await?;
+    // Flipped on SIGTERM/Ctrl-C: listeners stop accepting and drain.
+    let (stop_tx, stop_rx) = watch::channel(());
+
+    let serve = async {
+        match config.host.as_deref() {
+            Some(host) => {
+                let bind_addr = format!("{}:{}", host, config.port);
+                info!("Listening on {bind_addr}");
+                let listener = tokio::net::TcpListener::bind(&bind_addr).await?;
+                axum::serve(listener, app)
+                    .with_graceful_shutdown(stopped(stop_rx.clone()))
+                    .await?;
+            }
+            None => {
+                let v4_addr: SocketAddr = ([0, 0, 0, 0], config.port).into();
+                let v6_addr = SocketAddrV6::new(Ipv6Addr::UNSPECIFIED, config.port, 0, 0);
+                info!("Listening on {v4_addr} and [{}]:{}", v6_addr.ip(), v6_addr.port());
+
+                let v4_listener = tokio::net::TcpListener::bind(v4_addr).await?;
+                let v6_listener = bind_v6_only(v6_addr)?;
+
+                let app_v6 = app.clone();
+                let (stop_v4, stop_v6) = (stopped(stop_rx.clone()), stopped(stop_rx.clone()));
+                tokio::try_join!(
+                    async move { axum::serve(v4_listener, app).with_graceful_shutdown(stop_v4).await },
+                    async move { axum::serve(v6_listener, app_v6).with_graceful_shutdown(stop_v6).await },
+                )?;
+            }
         }
-        None => {
-            let v4_addr: SocketAddr = ([0, 0, 0, 0], config.port).into();
-            let v6_addr = SocketAddrV6::new(Ipv6Addr::UNSPECIFIED, config.port, 0, 0);
-            info!("Listening on {v4_addr} and [{}]:{}", v6_addr.ip(), v6_addr.port());
-
-            let v4_listener = tokio::net::TcpListener::bind(v4_addr).await?;
-            let v6_listener = bind_v6_only(v6_addr)?;
-
-            let app_v6 = app.clone();
-            tokio::try_join!(
-                async move { axum::serve(v4_listener, app).await },
-                async move { axum::serve(v6_listener, app_v6).await },
-            )?;
+        Ok::<(), anyhow::Error>(())
+    };
+    tokio::pin!(serve);
+
+    tokio::select! {
+        result = &mut serve => {
+            long_form_engine.kill_workers();
+            return result;
         }
+        () = &mut shutdown => {}
     }
 
+    info!("Shutting down: no new connections, waiting up to {SHUTDOWN_GRACE:?} for in-flight requests...");
+    let _ = stop_tx.send(());
+    let drained = tokio::time::timeout(SHUTDOWN_GRACE, serve).await;
+    long_form_engine.kill_workers();
+    match drained {
+        Ok(result) => result?,
+        Err(_) => warn!("Requests still in flight after {SHUTDOWN_GRACE:?}; exiting anyway"),
+    }
     Ok(())
 }
 
+/// Resolve when the process is asked to stop: Ctrl-C, or SIGTERM, which is
+/// what `docker stop` sends. As PID 1 in a container the process gets no
+/// default SIGTERM handling, so without this it would wait out the stop
+/// timeout and be killed.
+async fn shutdown_signal() {
+    let ctrl_c = async {
+        if let Err(e) = tokio::signal::ctrl_c().await {
+            warn!("Failed to listen for Ctrl-C: {e}");
+            std::future::pending::<()>().await;
+        }
+    };
+
+    #[cfg(unix)]
+    let terminate = async {
+        use tokio::signal::unix::{signal, SignalKind};
+        match signal(SignalKind::terminate()) {
+            Ok(mut sigterm) => {
+                sigterm.recv().await;
+            }
+            Err(e) => {
+                warn!("Failed to listen for SIGTERM: {e}");
+                std::future::pending::<()>().await;
+            }
+        }
+    };
+    #[cfg(not(unix))]
+    let terminate = std::future::pending::<()>();
+
+    tokio::select! {
+        () = ctrl_c => {}
+        () = terminate => {}
+    }
+}
+
+/// Graceful-shutdown trigger for one listener: resolves once the stop
+/// channel fires (or its sender is dropped).
+async fn stopped(mut stop_rx: watch::Receiver<()>) {
+    let _ = stop_rx.changed().await;
+}
+
 /// Bind an IPv6-only TCP listener. Setting `IPV6_V6ONLY` keeps this
 /// socket from claiming the IPv4 address space, so a separate IPv4
 /// listener on the same port can coexist regardless of the kernel's
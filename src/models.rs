@@ -255,6 +255,9 @@ pub struct ModelManager {
     /// STT entries in the registry are kept available for explicit
     /// `download_model()` calls but are not auto-downloaded.
     selected_stt_id: String,
+    /// Shared HTTP client, so consecutive files and models from the same
+    /// host reuse pooled connections instead of a fresh TLS handshake each.
+    client: reqwest::Client,
 }
 
 impl ModelManager {
@@ -279,6 +282,7 @@ impl ModelManager {
             models: Mutex::new(models),
             cancel_flags: Arc::new(Mutex::new(HashMap::new())),
             selected_stt_id,
+            client: reqwest::Client::new(),
         };
         mgr.update_download_status()?;
         Ok(mgr)
@@ -423,8 +427,6 @@ impl ModelManager {
             self.models_dir.clone()
         };
 
-        let client = reqwest::Client::new();
-
         for model_file in &files {
             if cancel_flag.load(Ordering::Relaxed) {
                 info!("Download cancelled for model {}", model_id);
@@ -445,7 +447,7 @@ impl ModelManager {
             }
 
             self.download_file(
-                &client,
+                &self.client,
                 model_file.url,
                 &dest_path,
                 model_file.filename,
@@ -619,3 +621,44 @@ impl ModelManager {
         flags.remove(model_id);
     }
 }
+
+/// Ask the kernel to start reading model files into the page cache.
+///
+/// Directories are walked one level deep, matching how multi-file models
+/// are laid out. `POSIX_FADV_WILLNEED` queues readahead and returns, so the
+/// ONNX loaders that follow mostly hit cached pages instead of waiting on
+/// disk. Best-effort: unreadable paths are skipped.
+pub fn prefetch_model_files(paths: &[&Path]) {
+    for path in paths {
+        if path.is_dir() {
+            let Ok(entries) = fs::read_dir(path) else {
+                continue;
+            };
+            for entry in entries.flatten() {
+                let file = entry.path();
+                if file.is_file() {
+                    advise_willneed(&file);
+                }
+            }
+        } else {
+            advise_willneed(path);
+        }
+    }
+}
+
+#[cfg(target_os = "linux")]
+fn advise_willneed(path: &Path) {
+    use std::os::unix::io::AsRawFd;
+
+    let Ok(file) = File::open(path) else {
+        return;
+    };
+    // Length 0 means "to end of file". The readahead outlives the fd.
+    let rc = unsafe { libc::posix_fadvise(file.as_raw_fd(), 0, 0, libc::POSIX_FADV_WILLNEED) };
+    if rc != 0 {
+        debug!("posix_fadvise failed for {}: errno {rc}", path.display());
+    }
+}
+
+#[cfg(not(target_os = "linux"))]
+fn advise_willneed(_path: &Path) {}
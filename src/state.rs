@@ -1,10 +1,7 @@
 use anyhow::{Context, Result};
 use std::collections::HashSet;
-use std::io::Write;
 use std::path::PathBuf;
 use std::sync::{Arc, Mutex};
-use tempfile::NamedTempFile;
-use tokio::sync::Semaphore;
 use tracing::{error, info};
 
 use crate::config::Config;
@@ -13,8 +10,8 @@ use crate::engines::llm::LlmEngine;
 use crate::engines::long_form::LongFormEngine;
 use crate::engines::stt::SttEngine;
 use crate::engines::vad::{SpeechSegment, VadEngine};
-use crate::long_form::LongFormOutcome;
-use crate::models::ModelManager;
+use crate::long_form::{LongFormOutcome, LongFormQueue, QueueTicket};
+use crate::models::{self, ModelManager};
 
 /// A transcribed speech segment with timestamps and token-level timing.
 #[derive(Debug, Clone, serde::Serialize)]
@@ -44,7 +41,7 @@ pub struct AppState {
     pub long_form_engine: LongFormEngine,
     /// FIFO queue for long-form jobs. Permit count defaults to 1 so only
     /// one worker runs at a time (bounded peak RAM).
-    pub long_form_semaphore: Arc<Semaphore>,
+    pub long_form_queue: Arc<LongFormQueue>,
     pub terms_content: String,
     pub dictionary: Dictionary,
     pub pipeline_config: PipelineConfig,
@@ -79,15 +76,31 @@ impl AppState {
             )
         };
 
-        info!("Loading STT model from {:?}...", stt_path);
-        let stt_engine = SttEngine::new(
-            &stt_path,
-            config.hotwords_score,
-            config.max_active_paths,
-            config.blank_penalty,
-            2,
-        )?;
-        info!("STT model loaded.");
+        // Start readahead on both models before the loaders below read them.
+        models::prefetch_model_files(&[stt_path.as_path(), vad_path.as_path()]);
+
+        // Load STT on a blocking thread while the LLM (download + load) and
+        // VAD are set up below: startup then costs the slowest of them
+        // rather than the sum.
+        let stt_threads = config.stt_num_threads.max(1);
+        info!("Loading STT model from {:?} ({stt_threads} threads)...", stt_path);
+        let stt_handle = {
+            let stt_path = stt_path.clone();
+            let decoding_method = config.decoding_method.clone();
+            let hotwords_score = config.hotwords_score;
+            let max_active_paths = config.max_active_paths;
+            let blank_penalty = config.blank_penalty;
+            tokio::task::spawn_blocking(move || {
+                SttEngine::new(
+                    &stt_path,
+                    &decoding_method,
+                    hotwords_score,
+                    max_active_paths,
+                    blank_penalty,
+                    stt_threads,
+                )
+            })
+        };
 
         // Initialize LLM engine only when explicitly enabled. Otherwise the
         // GGUF is neither downloaded nor loaded into RAM.
@@ -116,23 +129,34 @@ impl AppState {
         let vad_engine = VadEngine::new(&vad_path)?;
         info!("VAD model loaded.");
 
+        let stt_engine = stt_handle.await.context("STT loader task failed")??;
+        info!("STT model loaded.");
+
         let diarize_model_path = Self::locate_diarize_model(config, &mgr);
+        // Only the worker loads Sortformer, but warming it now means the
+        // first long-form job does not fault it in from cold storage.
+        if let Some(ref path) = diarize_model_path {
+            models::prefetch_model_files(&[path.as_path()]);
+        }
 
         let long_form_binary = locate_long_form_binary(config);
         info!("Long-form worker binary: {}", long_form_binary.display());
+        let long_form_threads = config.resolved_longform_num_threads();
+        info!("Long-form worker threads: {long_form_threads}");
         let long_form_engine = LongFormEngine::new(
             long_form_binary,
             stt_path.clone(),
             vad_path.clone(),
             diarize_model_path,
+            config.decoding_method.clone(),
             config.hotwords_score,
             config.max_active_paths,
             config.blank_penalty,
-            8,
+            long_form_threads,
         );
         let permits = config.max_longform_concurrency.max(1);
         info!("Long-form concurrency: {permits} permit(s)");
-        let long_form_semaphore = Arc::new(Semaphore::new(permits));
+        let long_form_queue = Arc::new(LongFormQueue::new(permits));
 
         // Load terms file
         let terms_file = config.resolved_terms_file();
@@ -179,7 +203,7 @@ impl AppState {
             llm_engine,
             vad_engine: Mutex::new(vad_engine),
             long_form_engine,
-            long_form_semaphore,
+            long_form_queue,
             terms_content,
             dictionary,
             pipeline_config,
@@ -187,45 +211,28 @@ impl AppState {
         })
     }
 
-    /// Run a long-form transcription job: acquires the long-form permit
-    /// (FIFO queue), materializes the PCM to a single tempfile, spawns
-    /// one `telemuze transcribe` worker that runs ASR and (if configured)
-    /// diarization in parallel on the same PCM, and returns the merged
-    /// outcome. The permit is held across the subprocess spawn so the
-    /// peak RAM from worker children is bounded by the permit count.
+    /// Run a long-form transcription job: waits for `ticket` to be admitted
+    /// by the long-form queue, spawns one `telemuze transcribe` worker, streams the
+    /// PCM to it over stdin, and returns the merged outcome. The worker
+    /// runs ASR and (if configured) diarization in parallel on the same
+    /// PCM. The permit is held across the subprocess spawn so the peak RAM
+    /// from worker children is bounded by the permit count.
     pub async fn long_form_transcribe(
         self: &Arc<Self>,
-        pcm: &[f32],
+        ticket: QueueTicket,
+        pcm: Vec<f32>,
         hotwords: Option<&str>,
     ) -> Result<LongFormOutcome> {
-        let waited_start = std::time::Instant::now();
-        let _permit = self
-            .long_form_semaphore
-            .clone()
-            .acquire_owned()
-            .await
-            .context("Long-form semaphore closed")?;
-        let waited = waited_start.elapsed();
-        if waited > std::time::Duration::from_millis(50) {
-            info!(
-                "Long-form job waited {:.1}s in queue",
-                waited.as_secs_f64()
-            );
-        }
-
-        let pcm_file = write_pcm_tempfile(pcm)?;
-        let pcm_path = pcm_file.path().to_path_buf();
+        let _permit = ticket.admit().await?;
 
         let long_form = self.long_form_engine.clone();
         let hw_owned = hotwords.map(str::to_owned);
         let result = tokio::task::spawn_blocking(move || {
-            long_form.transcribe_and_diarize(&pcm_path, hw_owned.as_deref())
+            long_form.transcribe_and_diarize(&pcm, hw_owned.as_deref())
         })
         .await
         .context("Long-form worker task join failed")??;
 
-        drop(pcm_file);
-
         if let Some(ref d) = result.diar {
             let n_spk = d.iter().map(|s| s.speaker).max().map(|m| m + 1).unwrap_or(0);
             info!("Diarization: {} segments, {} speakers", d.len(), n_spk);
@@ -237,6 +244,27 @@ impl AppState {
         })
     }
 
+    /// Transcribe short audio on the in-process engines, skipping the
+    /// worker subprocess and its model load. Returns the same outcome
+    /// shape as `long_form_transcribe`, without diarization.
+    pub fn short_form_transcribe(
+        &self,
+        pcm: &[f32],
+        hotwords: Option<&str>,
+    ) -> Result<LongFormOutcome> {
+        let segments = self.vad_segment(pcm)?;
+        let total = segments.len();
+        let asr_segments = segments
+            .iter()
+            .enumerate()
+            .filter_map(|(i, seg)| self.transcribe_segment(seg, i, total, hotwords))
+            .collect();
+        Ok(LongFormOutcome {
+            asr_segments,
+            diar_segments: None,
+        })
+    }
+
     fn locate_diarize_model(config: &Config, mgr: &ModelManager) -> Option<PathBuf> {
         let model_path = match config.diarization_model_path.as_ref() {
             Some(p) => p.clone(),
@@ -302,18 +330,17 @@ impl AppState {
     }
 }
 
-/// Write mono 16 kHz f32 PCM to a temp file as raw f32-LE bytes.
-/// Returned `NamedTempFile` auto-deletes when dropped.
-fn write_pcm_tempfile(pcm: &[f32]) -> Result<NamedTempFile> {
-    let mut tmp = NamedTempFile::new().context("Failed to create PCM tempfile")?;
-    let mut bytes = Vec::with_capacity(pcm.len() * 4);
-    for sample in pcm {
-        bytes.extend_from_slice(&sample.to_le_bytes());
-    }
-    tmp.write_all(&bytes)
-        .context("Failed to write PCM tempfile")?;
-    tmp.flush().context("Failed to flush PCM tempfile")?;
-    Ok(tmp)
+/// Run blocking work (ffmpeg decoding, VAD, STT inference) on tokio's
+/// blocking pool so it does not stall the async worker threads that serve
+/// other HTTP requests and Telegram updates.
+pub async fn run_blocking<T, F>(f: F) -> Result<T>
+where
+    F: FnOnce() -> Result<T> + Send + 'static,
+    T: Send + 'static,
+{
+    tokio::task::spawn_blocking(f)
+        .await
+        .context("Blocking task join failed")?
 }
 
 /// Locate the telemuze binary used to spawn long-form workers.
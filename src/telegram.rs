@@ -5,11 +5,12 @@
 //! Voice notes go through the smart dictation pipeline (STT + LLM),
 //! while audio/video file attachments use the long-form pipeline (VAD + STT).
 
+use std::collections::HashMap;
 use std::path::PathBuf;
-use std::sync::Arc;
-use std::time::Duration;
+use std::sync::{Arc, Mutex};
+use std::time::{Duration, Instant};
 
-use anyhow::Result;
+use anyhow::{Context, Result};
 use grammers_client::client::{Client, UpdatesConfiguration};
 use grammers_client::media::Media;
 use grammers_client::message::{InputMessage, Message as GrammersMessage};
@@ -17,23 +18,40 @@ use grammers_client::update::Update;
 use grammers_client::InvocationError;
 use grammers_client::SenderPool;
 use grammers_session::storages::SqliteSession;
+use grammers_session::types::PeerId;
+use tempfile::NamedTempFile;
+use tokio::io::AsyncWriteExt;
+use tokio::task::JoinSet;
 use tokio::time::sleep;
 use tracing::{error, info, warn};
 
 use crate::audio;
-use crate::long_form;
-use crate::state::AppState;
-
-/// Duration threshold (seconds) above which Telegram audio is routed
-/// through the long-form subprocess pipeline. Below this we keep the
-/// in-process VAD+STT loop used for voice dictations.
-const LONG_FORM_THRESHOLD_SECS: f64 = 60.0;
+use crate::long_form::{self, LONG_FORM_THRESHOLD_SECS};
+use crate::state::{run_blocking, AppState};
 
 /// Maximum length for a single Telegram message.
 const TELEGRAM_MAX_LEN: usize = 4096;
 
-/// Default delay before reconnecting after an error.
-const DEFAULT_RETRY_DELAY: Duration = Duration::from_secs(5);
+/// First reconnect delay; doubles with each consecutive failure.
+const INITIAL_RETRY_DELAY: Duration = Duration::from_millis(500);
+
+/// Upper bound on the reconnect delay.
+const MAX_RETRY_DELAY: Duration = Duration::from_secs(60);
+
+/// A connection that stayed up at least this long resets the backoff.
+const HEALTHY_CONNECTION: Duration = Duration::from_secs(60);
+
+/// Bot-wide budget for outgoing API calls; Telegram allows roughly 30
+/// messages per second per bot.
+const GLOBAL_CALLS_PER_SEC: f64 = 30.0;
+
+/// Per-chat budget; Telegram allows roughly one message per second in a
+/// chat, tolerating short bursts.
+const CHAT_CALLS_PER_SEC: f64 = 1.0;
+const CHAT_CALL_BURST: f64 = 5.0;
+
+/// Minimum spacing between progress edits of a status message.
+const PROGRESS_MIN_INTERVAL: Duration = Duration::from_secs(1);
 
 /// Return the path used to persist the Telegram MTProto session.
 fn session_path() -> PathBuf {
@@ -50,21 +68,60 @@ pub async fn run_bot(
     token: String,
     state: Arc<AppState>,
 ) -> ! {
+    // Shared across reconnects so a reconnect storm cannot reset the budget.
+    let global_bucket = Arc::new(TokenBucket::new(GLOBAL_CALLS_PER_SEC, GLOBAL_CALLS_PER_SEC));
+    // One bucket per chat, shared by every handler replying in that chat.
+    let mut chat_buckets = HashMap::new();
+    // Also shared across reconnects: in-flight handlers keep running (and
+    // replying) while the bot reconnects.
+    let mut handlers = JoinSet::new();
+    let mut backoff = INITIAL_RETRY_DELAY;
     loop {
-        match run_bot_once(api_id, api_hash.clone(), token.clone(), &state).await {
+        let started = Instant::now();
+        let result = run_bot_once(
+            api_id,
+            api_hash.clone(),
+            token.clone(),
+            &state,
+            &global_bucket,
+            &mut chat_buckets,
+            &mut handlers,
+        )
+        .await;
+        if started.elapsed() >= HEALTHY_CONNECTION {
+            backoff = INITIAL_RETRY_DELAY;
+        }
+
+        let delay = match result {
             Ok(()) => {
-                warn!("Telegram bot exited unexpectedly, reconnecting in {DEFAULT_RETRY_DELAY:?}...");
-                sleep(DEFAULT_RETRY_DELAY).await;
+                let delay = with_jitter(backoff);
+                warn!("Telegram bot exited unexpectedly, reconnecting in {delay:?}...");
+                delay
             }
             Err(e) => {
-                let delay = flood_wait_delay(&e).unwrap_or(DEFAULT_RETRY_DELAY);
+                // A server-mandated FLOOD_WAIT always wins over our backoff.
+                let delay = flood_wait_delay(&e).unwrap_or_else(|| with_jitter(backoff));
                 error!("Telegram bot error: {e:#}, reconnecting in {delay:?}...");
-                sleep(delay).await;
+                delay
             }
-        }
+        };
+        sleep(delay).await;
+        backoff = (backoff * 2).min(MAX_RETRY_DELAY);
     }
 }
 
+/// Stretch `delay` by up to 10% so that bots restarted together do not
+/// reconnect in lockstep. `RandomState` is randomly keyed per instance,
+/// which is all the randomness this needs.
+fn with_jitter(delay: Duration) -> Duration {
+    use std::hash::{BuildHasher, Hasher};
+
+    let random = std::collections::hash_map::RandomState::new()
+        .build_hasher()
+        .finish();
+    delay + delay.mul_f64((random % 1000) as f64 / 10_000.0)
+}
+
 /// Extract the FLOOD_WAIT delay from an error chain, if present.
 fn flood_wait_delay(err: &anyhow::Error) -> Option<Duration> {
     for cause in err.chain() {
@@ -84,6 +141,9 @@ async fn run_bot_once(
     api_hash: String,
     token: String,
     state: &Arc<AppState>,
+    global_bucket: &Arc<TokenBucket>,
+    chat_buckets: &mut HashMap<PeerId, Arc<TokenBucket>>,
+    handlers: &mut JoinSet<()>,
 ) -> Result<()> {
     let path = session_path();
     if let Some(parent) = path.parent() {
@@ -110,13 +170,25 @@ async fn run_bot_once(
 
     loop {
         let update = update_stream.next().await?;
+        reap_handlers(handlers);
+        // Forget buckets nobody is using once they have fully refilled;
+        // a fresh bucket for that chat would be indistinguishable.
+        chat_buckets.retain(|_, bucket| Arc::strong_count(bucket) > 1 || !bucket.is_full());
         match update {
             Update::NewMessage(message) if !message.outgoing() => {
                 let client = client.clone();
                 let state = state.clone();
-                tokio::spawn(async move {
-                    if let Err(e) = handle_message(&client, &message, &state).await {
+                let chat_bucket = chat_buckets
+                    .entry(message.peer_id())
+                    .or_insert_with(|| {
+                        Arc::new(TokenBucket::new(CHAT_CALL_BURST, CHAT_CALLS_PER_SEC))
+                    })
+                    .clone();
+                let pacer = Pacer::new(global_bucket.clone(), chat_bucket);
+                handlers.spawn(async move {
+                    if let Err(e) = handle_message(&client, &message, &state, &pacer).await {
                         error!("Error handling Telegram message: {e:#}");
+                        pacer.wait().await;
                         let _ = message.reply(format!("Error: {e:#}")).await;
                     }
                 });
@@ -126,9 +198,88 @@ async fn run_bot_once(
     }
 }
 
+/// Collect finished message handlers so the set stays small, surfacing
+/// any that panicked instead of letting the panic vanish with the task.
+fn reap_handlers(handlers: &mut JoinSet<()>) {
+    while let Some(result) = handlers.try_join_next() {
+        if let Err(e) = result {
+            error!("Telegram message handler failed: {e}");
+        }
+    }
+}
+
+/// Token bucket used to pace outgoing Telegram API calls.
+struct TokenBucket {
+    capacity: f64,
+    per_sec: f64,
+    /// Available tokens and the time they were last topped up.
+    state: Mutex<(f64, Instant)>,
+}
+
+impl TokenBucket {
+    fn new(capacity: f64, per_sec: f64) -> Self {
+        Self {
+            capacity,
+            per_sec,
+            state: Mutex::new((capacity, Instant::now())),
+        }
+    }
+
+    /// Whether the bucket has refilled to capacity.
+    fn is_full(&self) -> bool {
+        let (tokens, last) = *self.state.lock().unwrap();
+        tokens + last.elapsed().as_secs_f64() * self.per_sec >= self.capacity
+    }
+
+    /// Wait until a token is available, then take it.
+    async fn acquire(&self) {
+        loop {
+            let wait = {
+                let mut guard = self.state.lock().unwrap();
+                let (tokens, last) = &mut *guard;
+                let now = Instant::now();
+                let refill = now.duration_since(*last).as_secs_f64() * self.per_sec;
+                *tokens = (*tokens + refill).min(self.capacity);
+                *last = now;
+                if *tokens >= 1.0 {
+                    *tokens -= 1.0;
+                    return;
+                }
+                Duration::from_secs_f64((1.0 - *tokens) / self.per_sec)
+            };
+            sleep(wait).await;
+        }
+    }
+}
+
+/// Paces the outgoing calls made while handling one incoming message:
+/// the budget of its chat, shared by every handler in that chat, plus the
+/// bot-wide budget shared by all handlers.
+/// Waiting up front keeps bursts of status edits from tripping FLOOD_WAIT.
+#[derive(Clone)]
+struct Pacer {
+    global: Arc<TokenBucket>,
+    chat: Arc<TokenBucket>,
+}
+
+impl Pacer {
+    fn new(global: Arc<TokenBucket>, chat: Arc<TokenBucket>) -> Self {
+        Self { global, chat }
+    }
+
+    /// Wait for permission to make one API call.
+    async fn wait(&self) {
+        self.chat.acquire().await;
+        self.global.acquire().await;
+    }
+}
+
 /// A status message that can be updated and eventually deleted.
 struct StatusMessage {
     msg: GrammersMessage,
+    pacer: Pacer,
+    /// Last text shown and when it was set, for skipping redundant edits.
+    last: Mutex<(String, Instant)>,
 }
 
 impl StatusMessage {
@@ -136,20 +287,45 @@ impl StatusMessage {
     async fn new(
         reply_to: &grammers_client::update::Message,
         text: &str,
+        pacer: &Pacer,
     ) -> Result<Self> {
+        pacer.wait().await;
         let msg = reply_to.reply(text).await?;
-        Ok(Self { msg })
+        Ok(Self {
+            msg,
+            pacer: pacer.clone(),
+            last: Mutex::new((text.to_string(), Instant::now())),
+        })
     }
 
-    /// Update the status message text.
+    /// Update the status message text. Unchanged text is not re-sent; a
+    /// failed edit is not recorded, so retrying the same text sends it.
     async fn update(&self, text: &str) {
-        if let Err(e) = self.msg.edit(InputMessage::new().text(text)).await {
-            warn!("Failed to update status message: {e}");
+        if self.last.lock().unwrap().0 == text {
+            return;
+        }
+        self.pacer.wait().await;
+        match self.msg.edit(InputMessage::new().text(text)).await {
+            Ok(_) => *self.last.lock().unwrap() = (text.to_string(), Instant::now()),
+            Err(e) => warn!("Failed to update status message: {e}"),
         }
     }
 
-    /// Delete the status message.
+    /// Update with fast-changing progress text. Edits arriving within
+    /// `PROGRESS_MIN_INTERVAL` of the previous one are dropped; the next
+    /// stage update or the final reply supersedes them anyway.
+    async fn progress(&self, text: &str) {
+        let recent = self.last.lock().unwrap().1.elapsed() < PROGRESS_MIN_INTERVAL;
+        if !recent {
+            self.update(text).await;
+        }
+    }
+
+    /// Delete the status message. Called once the reply is out, so the
+    /// user sees the result without waiting on the delete, while the
+    /// delete still runs inside the handler's tracked task.
     async fn delete(self) {
+        self.pacer.wait().await;
         if let Err(e) = self.msg.delete().await {
             warn!("Failed to delete status message: {e}");
         }
@@ -160,6 +336,7 @@ async fn handle_message(
     client: &Client,
     message: &grammers_client::update::Message,
     state: &Arc<AppState>,
+    pacer: &Pacer,
 ) -> Result<()> {
     // Check if the sender is in the allowed users list.
     if !state.telegram_allowed_users.is_empty() {
@@ -184,6 +361,7 @@ async fn handle_message(
     let media = match message.media() {
         Some(m) => m,
         None => {
+            pacer.wait().await;
             message
                 .reply("Send me a voice note for smart dictation, or an audio/video file for long-form transcription.")
                 .await?;
@@ -202,24 +380,34 @@ async fn handle_message(
                     "Telegram: voice note from {:?}",
                     message.sender_id()
                 );
-                let status = StatusMessage::new(message, "Receiving voice note...").await?;
-                let bytes = download_media(client, &media).await?;
-                transcribe_and_reply(client, message, &bytes, state, "voice note", status).await?;
+                // The status reply and the download are independent round
+                // trips; overlapping them saves one before work can start.
+                let (status, file) = tokio::try_join!(
+                    StatusMessage::new(message, "Receiving voice note...", pacer),
+                    download_media(client, &media),
+                )?;
+                transcribe_and_reply(client, message, file, state, pacer, "voice note", status)
+                    .await?;
             } else if is_audio_video {
                 info!(
                     "Telegram: audio/video file ({mime}) from {:?}",
                     message.sender_id()
                 );
-                let status = StatusMessage::new(message, "Receiving file...").await?;
-                let bytes = download_media(client, &media).await?;
-                transcribe_and_reply(client, message, &bytes, state, "long-form", status).await?;
+                let (status, file) = tokio::try_join!(
+                    StatusMessage::new(message, "Receiving file...", pacer),
+                    download_media(client, &media),
+                )?;
+                transcribe_and_reply(client, message, file, state, pacer, "long-form", status)
+                    .await?;
             } else {
+                pacer.wait().await;
                 message
                     .reply(format!("Unsupported file type: {mime}"))
                     .await?;
             }
         }
         _ => {
+            pacer.wait().await;
             message
                 .reply("Send me a voice note or audio/video file to transcribe.")
                 .await?;
@@ -229,39 +417,50 @@ async fn handle_message(
     Ok(())
 }
 
-async fn download_media(client: &Client, media: &Media) -> Result<Vec<u8>> {
-    let mut bytes = Vec::new();
+/// Stream a media download straight into a tempfile, so a large video is
+/// never held in memory and ffmpeg can read it in place.
+async fn download_media(client: &Client, media: &Media) -> Result<NamedTempFile> {
+    let tmp = NamedTempFile::new().context("Failed to create tempfile")?;
+    let mut file = tokio::fs::File::from_std(
+        tmp.reopen().context("Failed to open tempfile for writing")?,
+    );
+    let mut total = 0usize;
     let mut download = client.iter_download(media);
     while let Some(chunk) = download.next().await? {
-        bytes.extend(chunk);
+        file.write_all(&chunk)
+            .await
+            .context("Failed to write download to tempfile")?;
+        total += chunk.len();
     }
-    info!("Downloaded {} bytes from Telegram", bytes.len());
-    Ok(bytes)
+    file.flush().await.context("Failed to flush download to tempfile")?;
+    info!("Downloaded {total} bytes from Telegram");
+    Ok(tmp)
 }
 
-/// Transcribe audio bytes and reply with the result. Routes to the
+/// Transcribe a downloaded audio file and reply with the result. Routes to the
 /// in-process VAD+STT loop for short clips (≤60 s, voice-dictation style)
 /// or to the long-form subprocess pipeline for longer audio (multi-speaker
 /// meetings, podcasts), matching the HTTP endpoint's behavior.
 async fn transcribe_and_reply(
     client: &Client,
     message: &grammers_client::update::Message,
-    bytes: &[u8],
+    file: NamedTempFile,
     state: &Arc<AppState>,
+    pacer: &Pacer,
     label: &str,
     status: StatusMessage,
 ) -> Result<()> {
     status.update("Decoding audio...").await;
-    let pcm = audio::decode_to_pcm(bytes)?;
+    let pcm = run_blocking(move || audio::decode_file_to_pcm(file.path())).await?;
     let duration_secs = pcm.len() as f64 / 16_000.0;
     info!("Telegram {label}: {:.1}s of audio", duration_secs);
 
     let duration_display = long_form::format_duration(duration_secs);
 
     if duration_secs <= LONG_FORM_THRESHOLD_SECS {
-        transcribe_short(message, &pcm, state, &duration_display, status).await?;
+        transcribe_short(message, pcm, state, pacer, &duration_display, status).await?;
     } else {
-        transcribe_long(client, message, &pcm, state, &duration_display, status).await?;
+        transcribe_long(client, message, pcm, state, pacer, &duration_display, status).await?;
     }
     Ok(())
 }
@@ -270,8 +469,9 @@ async fn transcribe_and_reply(
 /// no queue, no diarization — replies with plain text.
 async fn transcribe_short(
     message: &grammers_client::update::Message,
-    pcm: &[f32],
-    state: &AppState,
+    pcm: Vec<f32>,
+    state: &Arc<AppState>,
+    pacer: &Pacer,
     duration_display: &str,
     status: StatusMessage,
 ) -> Result<()> {
@@ -279,22 +479,26 @@ async fn transcribe_short(
         .update(&format!("Transcribing {duration_display} of audio..."))
         .await;
 
-    let segments = state.vad_segment(pcm)?;
+    let vad_state = state.clone();
+    let segments = run_blocking(move || vad_state.vad_segment(&pcm)).await?;
     let total = segments.len();
 
     let mut results = Vec::with_capacity(total);
-    for (i, seg) in segments.iter().enumerate() {
+    for (i, seg) in segments.into_iter().enumerate() {
         if total > 1 {
             let position = long_form::format_duration(seg.start_secs);
             status
-                .update(&format!(
+                .progress(&format!(
                     "Transcribing {duration_display} of audio... (segment {}/{total}, {position})",
                     i + 1,
                 ))
                 .await;
         }
 
-        if let Some(result) = state.transcribe_segment(seg, i, total, None) {
+        let stt_state = state.clone();
+        let result =
+            run_blocking(move || Ok(stt_state.transcribe_segment(&seg, i, total, None))).await?;
+        if let Some(result) = result {
             results.push(result);
         }
     }
@@ -305,13 +509,14 @@ async fn transcribe_short(
         .collect::<Vec<_>>()
         .join(" ");
 
-    status.delete().await;
-
-    if full_text.is_empty() {
-        message.reply("No speech detected.").await?;
+    pacer.wait().await;
+    let sent = if full_text.is_empty() {
+        message.reply("No speech detected.").await
     } else {
-        message.reply(full_text.as_str()).await?;
-    }
+        message.reply(full_text.as_str()).await
+    };
+    status.delete().await;
+    sent?;
     Ok(())
 }
 
@@ -321,21 +526,44 @@ async fn transcribe_short(
 async fn transcribe_long(
     client: &Client,
     message: &grammers_client::update::Message,
-    pcm: &[f32],
+    pcm: Vec<f32>,
     state: &Arc<AppState>,
+    pacer: &Pacer,
     duration_display: &str,
     status: StatusMessage,
 ) -> Result<()> {
-    // The semaphore acquisition inside long_form_transcribe is FIFO;
-    // we show a coarse "Queued" state up front and then transition to
-    // "Transcribing" once we're running.
-    status
-        .update(&format!(
-            "Queued for long-form transcription ({duration_display})..."
-        ))
-        .await;
-
-    let outcome = state.long_form_transcribe(pcm, None).await?;
+    // The long-form queue is FIFO; report where this job joined it, or
+    // that it is starting right away.
+    let queued_text = |position: usize| {
+        format!("Queued for long-form transcription ({duration_display}), position {position}...")
+    };
+    let started_text = format!("Transcribing {duration_display} of audio (long-form)...");
+    let ticket = state.long_form_queue.join();
+    let mut positions = ticket.positions();
+    let initial = ticket.position();
+
+    // Start polling the job straight away and run the status edits beside
+    // it, never in between: only the head of the queue asks for a permit,
+    // so a paced (or stalled) Telegram edit must never stand between this
+    // job and admission, or everyone behind it waits too.
+    let job = state.long_form_transcribe(ticket, pcm, None);
+    // While queued, edit the status only when the job actually moves up.
+    // Departures are coalesced by the queue, and unchanged text is never
+    // re-sent, so a burst of jobs finishing costs one edit per message.
+    let report = async {
+        if let Some(position) = initial {
+            status.update(&queued_text(position)).await;
+            while let Some(position) = positions.next().await {
+                status.update(&queued_text(position)).await;
+            }
+        }
+        status.update(&started_text).await;
+    };
+    tokio::pin!(job, report);
+    let outcome = tokio::select! {
+        outcome = &mut job => outcome?,
+        () = &mut report => job.await?,
+    };
 
     status
         .update(&format!("Finalizing transcript ({duration_display})..."))
@@ -344,14 +572,10 @@ async fn transcribe_long(
     let subs = long_form::finalize(outcome);
     let text = long_form::format_as_text(&subs);
 
+    let reply = if text.is_empty() { "No speech detected." } else { text.as_str() };
+    let sent = send_reply(client, message, pacer, reply).await;
     status.delete().await;
-
-    if text.is_empty() {
-        message.reply("No speech detected.").await?;
-    } else {
-        send_reply(client, message, &text).await?;
-    }
-    Ok(())
+    sent
 }
 
 /// Send the transcript as a reply. If it fits in a single message, send as text.
@@ -359,9 +583,12 @@ async fn transcribe_long(
 async fn send_reply(
     client: &Client,
     message: &grammers_client::update::Message,
+    pacer: &Pacer,
     text: &str,
 ) -> Result<()> {
+    // One pacer token per outgoing message; the upload is not a message.
     if text.len() <= TELEGRAM_MAX_LEN {
+        pacer.wait().await;
         message.reply(text).await?;
         return Ok(());
     }
@@ -375,6 +602,7 @@ async fn send_reply(
     let input = InputMessage::new()
         .text("Transcript too long for a message — sent as file.")
         .file(uploaded);
+    pacer.wait().await;
     message.reply(input).await?;
 
     Ok(())
@@ -1,7 +1,7 @@
 //! `telemuze transcribe` subcommand — one-shot long-form worker.
 //!
-//! Loads VAD + STT (and optionally Sortformer diarization), reads raw
-//! f32-LE mono 16 kHz PCM from a tempfile, runs ASR and diarization
+//! Loads VAD + STT (and optionally Sortformer diarization) while reading
+//! raw f32-LE mono 16 kHz PCM from stdin, runs ASR and diarization
 //! concurrently on the shared buffer, and prints a JSON
 //! `{"segments":[...], "diarization":[...]}` payload on stdout. Exits
 //! with code 0 on success.
@@ -10,15 +10,23 @@ use anyhow::{Context, Result};
 use clap::Parser;
 use serde::Serialize;
 use std::fs;
+use std::io::Write;
 use std::path::PathBuf;
+use std::sync::mpsc;
+use std::thread::ScopedJoinHandle;
 use tracing::{error, info};
 
+use crate::audio;
 use crate::engines::sortformer::SortformerEngine;
 use crate::engines::stt::SttEngine;
-use crate::engines::vad::VadEngine;
+use crate::engines::vad::{SpeechSegment, VadEngine};
+use crate::models;
 
 const SAMPLE_RATE: f64 = 16_000.0;
 
+/// Number of VAD segments allowed to queue up ahead of the ASR loop.
+const VAD_LOOKAHEAD: usize = 4;
+
 #[derive(Parser, Debug)]
 #[command(name = "telemuze transcribe")]
 struct WorkerArgs {
@@ -28,12 +36,21 @@ struct WorkerArgs {
     #[arg(long)]
     vad_model: PathBuf,
 
+    /// Raw f32-LE mono 16 kHz PCM input, or `-` to read it from stdin.
     #[arg(long)]
     pcm: PathBuf,
 
+    /// Hotwords, one per line, passed inline. This is how the server
+    /// sends typical lists; `--hotwords-file` covers very large ones.
+    #[arg(long, allow_hyphen_values = true, conflicts_with = "hotwords_file")]
+    hotwords: Option<String>,
+
     #[arg(long)]
     hotwords_file: Option<PathBuf>,
 
+    #[arg(long, default_value = "modified_beam_search")]
+    decoding_method: String,
+
     #[arg(long, default_value_t = 1.5)]
     hotwords_score: f32,
 
@@ -78,7 +95,13 @@ struct Output {
     diarization: Option<Vec<OutDiarSegment>>,
 }
 
+/// Read the worker's input PCM. `-` means stdin, which is how the server
+/// hands audio to the worker; a file path is accepted for manual runs.
 fn read_pcm(path: &std::path::Path) -> Result<Vec<f32>> {
+    if path.as_os_str() == "-" {
+        return audio::read_f32le(std::io::stdin().lock())
+            .context("Failed to read PCM from stdin");
+    }
     let bytes = fs::read(path)
         .with_context(|| format!("Failed to read PCM file: {}", path.display()))?;
     anyhow::ensure!(
@@ -98,36 +121,59 @@ fn run_asr(
     pcm: &[f32],
     hotwords: Option<&str>,
 ) -> Result<Vec<OutSegment>> {
-    let segments = vad.segment_audio(pcm).context("VAD segmentation failed")?;
-    info!("VAD found {} speech segments", segments.len());
-
-    let mut out_segments = Vec::with_capacity(segments.len());
-    for (i, seg) in segments.iter().enumerate() {
-        match stt.transcribe_with_hotwords(&seg.samples, hotwords) {
-            Ok(result) if !result.text.trim().is_empty() => {
-                info!(
-                    "Segment {}/{}: [{:.1}s - {:.1}s] '{}'",
-                    i + 1,
-                    segments.len(),
-                    seg.start_secs,
-                    seg.end_secs,
-                    result.text,
-                );
-                out_segments.push(OutSegment {
-                    start: seg.start_secs,
-                    end: seg.end_secs,
-                    text: result.text,
-                    tokens: result.tokens,
-                    token_timestamps: result.timestamps,
-                });
-            }
-            Ok(_) => {}
-            Err(e) => {
-                error!("STT failed for segment {}: {e}", i + 1);
+    // VAD runs on its own thread and hands segments over a small bounded
+    // channel, so Silero keeps scanning ahead while Parakeet decodes the
+    // segments it has already closed.
+    let (tx, rx) = mpsc::sync_channel::<SpeechSegment>(VAD_LOOKAHEAD);
+
+    std::thread::scope(|scope| -> Result<Vec<OutSegment>> {
+        let vad_handle = scope.spawn(move || {
+            vad.for_each_segment(pcm, |seg| {
+                tx.send(seg)
+                    .map_err(|_| anyhow::anyhow!("ASR consumer hung up"))
+            })
+        });
+
+        let mut out_segments = Vec::new();
+        let mut total = 0usize;
+        for seg in rx {
+            total += 1;
+            match stt.transcribe_with_hotwords(&seg.samples, hotwords) {
+                Ok(result) if !result.text.trim().is_empty() => {
+                    info!(
+                        "Segment {}: [{:.1}s - {:.1}s] '{}'",
+                        total, seg.start_secs, seg.end_secs, result.text,
+                    );
+                    out_segments.push(OutSegment {
+                        start: seg.start_secs,
+                        end: seg.end_secs,
+                        text: result.text,
+                        tokens: result.tokens,
+                        token_timestamps: result.timestamps,
+                    });
+                }
+                Ok(_) => {}
+                Err(e) => {
+                    error!("STT failed for segment {total}: {e}");
+                }
             }
         }
-    }
-    Ok(out_segments)
+
+        vad_handle
+            .join()
+            .map_err(|_| anyhow::anyhow!("VAD thread panicked"))?
+            .context("VAD segmentation failed")?;
+        info!("VAD found {total} speech segments");
+        Ok(out_segments)
+    })
+}
+
+/// Join a scoped thread that returns a `Result`, turning a panic into an
+/// error labelled with `what`.
+fn join_scoped<T>(handle: ScopedJoinHandle<'_, Result<T>>, what: &str) -> Result<T> {
+    handle
+        .join()
+        .map_err(|_| anyhow::anyhow!("{what} thread panicked"))?
 }
 
 pub fn run(argv: &[String]) -> Result<()> {
@@ -141,50 +187,74 @@ pub fn run(argv: &[String]) -> Result<()> {
     if !args.vad_model.is_file() {
         anyhow::bail!("VAD model file not found: {}", args.vad_model.display());
     }
-    if !args.pcm.is_file() {
+    if args.pcm.as_os_str() != "-" && !args.pcm.is_file() {
         anyhow::bail!("PCM file not found: {}", args.pcm.display());
     }
 
-    let pcm = read_pcm(&args.pcm)?;
+    if let Some(path) = args.diarize_model.as_ref() {
+        if !path.is_file() {
+            anyhow::bail!("Sortformer model file not found: {}", path.display());
+        }
+    }
+
+    // Start readahead on every model file up front so the loaders below
+    // find them in the page cache (already warm if another job ran
+    // recently) rather than each faulting its file in from disk.
+    let mut model_paths = vec![args.stt_model.as_path(), args.vad_model.as_path()];
+    model_paths.extend(args.diarize_model.as_deref());
+    models::prefetch_model_files(&model_paths);
+
+    // Reading the PCM and loading each model are independent, so run them
+    // side by side: startup then costs the slowest of them rather than the
+    // sum. Loading is mostly disk reads and ONNX session init, which leaves
+    // the other cores idle when done one after another.
+    let (pcm, vad, stt, sortformer) = std::thread::scope(|scope| -> Result<_> {
+        let pcm_handle = scope.spawn(|| read_pcm(&args.pcm));
+
+        let stt_handle = scope.spawn(|| {
+            info!("Loading STT model from {:?}...", args.stt_model);
+            SttEngine::new(
+                &args.stt_model,
+                &args.decoding_method,
+                args.hotwords_score,
+                args.max_active_paths,
+                args.blank_penalty,
+                args.num_threads,
+            )
+            .context("Failed to load STT model")
+        });
+
+        let sortformer_handle = args.diarize_model.as_ref().map(|path| {
+            scope.spawn(move || {
+                info!("Loading Sortformer diarization model from {:?}...", path);
+                SortformerEngine::new(path, args.diarize_num_threads)
+                    .context("Failed to load Sortformer model")
+            })
+        });
+
+        info!("Loading VAD model from {:?}...", args.vad_model);
+        let vad = VadEngine::new(&args.vad_model).context("Failed to load VAD model");
+
+        let pcm = join_scoped(pcm_handle, "PCM reader")?;
+        let stt = join_scoped(stt_handle, "STT loader")?;
+        let sortformer = sortformer_handle
+            .map(|h| join_scoped(h, "Sortformer loader"))
+            .transpose()?;
+        Ok((pcm, vad?, stt, sortformer))
+    })?;
+
     info!(
         "telemuze transcribe: loaded {} samples ({:.1}s)",
         pcm.len(),
         pcm.len() as f64 / SAMPLE_RATE
     );
 
-    info!("Loading VAD model from {:?}...", args.vad_model);
-    let vad = VadEngine::new(&args.vad_model).context("Failed to load VAD model")?;
-
-    info!("Loading STT model from {:?}...", args.stt_model);
-    let stt = SttEngine::new(
-        &args.stt_model,
-        args.hotwords_score,
-        args.max_active_paths,
-        args.blank_penalty,
-        args.num_threads,
-    )
-    .context("Failed to load STT model")?;
-
-    let sortformer = match args.diarize_model.as_ref() {
-        Some(path) => {
-            if !path.is_file() {
-                anyhow::bail!("Sortformer model file not found: {}", path.display());
-            }
-            info!("Loading Sortformer diarization model from {:?}...", path);
-            Some(
-                SortformerEngine::new(path, args.diarize_num_threads)
-                    .context("Failed to load Sortformer model")?,
-            )
-        }
-        None => None,
-    };
-
     let hotwords = if let Some(path) = &args.hotwords_file {
         let s = fs::read_to_string(path)
             .with_context(|| format!("Failed to read hotwords file: {}", path.display()))?;
         Some(s)
     } else {
-        None
+        args.hotwords.clone()
     };
 
     let (asr_result, diar_result) = std::thread::scope(|scope| {
@@ -241,7 +311,11 @@ pub fn run(argv: &[String]) -> Result<()> {
         segments: out_segments,
         diarization,
     };
-    let json = serde_json::to_string(&out).context("Failed to serialize output")?;
-    println!("{json}");
+    // Serialize straight into a buffered stdout rather than building the
+    // whole payload as a String first.
+    let mut stdout = std::io::BufWriter::new(std::io::stdout().lock());
+    serde_json::to_writer(&mut stdout, &out).context("Failed to serialize output")?;
+    writeln!(stdout).context("Failed to write output")?;
+    stdout.flush().context("Failed to flush output")?;
     Ok(())
 }